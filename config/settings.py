@@ -4,6 +4,8 @@
 IB_HOST = '127.0.0.1'  # Use 'ibkr-gateway' if connecting from another container
 IB_PORT = 4002  # Default port for IB Gateway
 CLIENT_ID = 1
+CONNECT_ATTEMPTS = 5  # Connection attempts before giving up
+RECONNECT_MAX_DELAY = 8  # Cap on the exponential backoff between attempts (seconds)
 
 # Trading parameters
 POSITION_SIZE = 100  # Base number of shares to trade
@@ -18,12 +20,19 @@ SMA_LONG = 20
 
 # Volatility strategy parameters
 VOLATILITY_FACTOR = 2.0  # Number of standard deviations for bands
+BREAKOUT_MIN_MOVE = 1e-4  # Skip contracts whose last bar moved less than this fraction
 
 # Execution settings
 EXECUTION_INTERVAL = 3600  # Run strategy every hour (in seconds)
+ACCOUNT_SUMMARY_TTL = 10  # Reuse account summary data for this many seconds
+MAX_CONCURRENT_HISTORICAL_REQUESTS = 8  # Stay well inside IBKR's request pacing limits
+HISTORICAL_CACHE_TTL = 60  # Reuse identical historical data requests for this many seconds
+SIGNAL_WORKERS = 4  # Threads evaluating contracts in parallel within a strategy
+HISTORY_FETCH_WORKERS = 32  # Threads fetching history from providers without get_batch
 
 # Risk management
 MAX_PORTFOLIO_RISK = 0.02  # Maximum 2% portfolio risk per trade
+CORRELATION_CACHE_TTL = 3600  # Reuse the correlation matrix for this many seconds
 
 # Logging settings
 LOG_LEVEL = 'INFO'
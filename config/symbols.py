@@ -1,4 +1,5 @@
 """ETF symbols configuration."""
+import pytz
 from ib_insync import Stock
 
 # List of non-US eco ETFs to trade (filtered for scores > 5 on both profitability and world-helping)
@@ -29,4 +30,7 @@ EXCHANGE_TIMEZONES = {
     'NASDAQ': 'America/New_York',
     'BIT': 'Europe/Rome',
     'SIX': 'Europe/Zurich'
-}
\ No newline at end of file
+}
+
+# Timezone objects built once at import so market-hours checks don't reparse zoneinfo
+EXCHANGE_TZ = {exchange: pytz.timezone(tz) for exchange, tz in EXCHANGE_TIMEZONES.items()}
\ No newline at end of file
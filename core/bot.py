@@ -1,6 +1,5 @@
 """Main bot class that orchestrates the trading process."""
 import logging
-import time
 from config.settings import EXECUTION_INTERVAL
 from config.symbols import ETF_LIST
 
@@ -20,28 +19,57 @@ class EcoETFBot:
         self.order_executor = order_executor
         self.portfolio = portfolio
         self.risk_manager = risk_manager
-        self.etfs = ETF_LIST
+        
+        # Risk managers tracking win rates hear about stop and take-profit exits too
+        if hasattr(risk_manager, 'record_trade'):
+            position_manager.on_trade_closed = risk_manager.record_trade
+        
+        # Risk managers with trailing stops have them checked in the same exit pass
+        if hasattr(risk_manager, 'bulk_should_exit'):
+            position_manager.trailing_stops = risk_manager
+        
+        self.etfs = self.qualify_etfs(ETF_LIST)
+        self.etfs_by_symbol = {etf.symbol: etf for etf in self.etfs}
         self.running = False
     
+    def qualify_etfs(self, etfs):
+        """Resolve ETF contracts once so later requests skip contract lookup.
+        
+        Returns:
+            list: The qualified contracts, or the unqualified list on failure
+        """
+        ib = self.connection.ensure_connection()
+        
+        try:
+            qualified = ib.qualifyContracts(*etfs)
+            if len(qualified) < len(etfs):
+                resolved = {etf.symbol for etf in qualified}
+                missing = [etf.symbol for etf in etfs if etf.symbol not in resolved]
+                logger.warning("Could not qualify contracts: %s", ', '.join(missing))
+            return qualified
+        except Exception as e:
+            logger.error("Error qualifying contracts: %s", e)
+            return list(etfs)
+    
     def execute_cycle(self):
         """Execute one full trading cycle."""
         logger.info("Starting trading cycle")
         
         try:
-            # Update portfolio and positions
-            self.portfolio.update_positions()
-            self.position_manager.update_positions()
-            
+            # Portfolio and positions are kept current by updatePortfolioEvent
             # Manage existing positions (check stop losses, etc.)
             self.position_manager.manage_open_positions()
             
             # Generate new signals
             signals = self.strategy.generate_signals(self.etfs)
             
-            # Execute signals if risk allows
+            # Collect orders for signals that risk allows
+            portfolio_value = self.portfolio.get_total_value()
+            orders = []  # (contract, action, quantity)
+            entry_costs = []  # avg_cost of the position each SELL closes, None for BUYs
             for symbol, signal_data in signals.items():
                 # Find the contract for this symbol
-                contract = next((etf for etf in self.etfs if etf.symbol == symbol), None)
+                contract = self.etfs_by_symbol.get(symbol)
                 if not contract:
                     continue
                 
@@ -50,9 +78,8 @@ class EcoETFBot:
                 volatility = signal_data.get('volatility', 0.2)
                 
                 # Check if we can take this position based on risk
-                portfolio_value = self.portfolio.get_total_value()
                 if not self.risk_manager.check_portfolio_risk(self.portfolio):
-                    logger.info(f"Skipping {symbol} {action} due to portfolio risk limits")
+                    logger.info("Skipping %s %s due to portfolio risk limits", symbol, action)
                     continue
                 
                 # Implement the signal
@@ -60,38 +87,37 @@ class EcoETFBot:
                     # Calculate position size based on risk management
                     quantity = self.risk_manager.calculate_position_size(
                         price, volatility, portfolio_value)
-                    
-                    # Place the order
-                    order_result = self.order_executor.place_market_order(
-                        contract, 'BUY', quantity)
-                    
-                    if order_result and 'fill_price' in order_result:
-                        # Record the transaction
-                        self.portfolio.record_transaction(
-                            contract, 'BUY', quantity, order_result['fill_price'])
+                    orders.append((contract, 'BUY', quantity))
+                    entry_costs.append(None)
                         
                 elif action == 'SELL' and self.position_manager.has_position(symbol):
                     position = self.position_manager.positions[symbol]
-                    
-                    # Place the order
-                    order_result = self.order_executor.place_market_order(
-                        contract, 'SELL', abs(position['quantity']))
-                    
+                    orders.append((contract, 'SELL', abs(position['quantity'])))
+                    entry_costs.append(position['avg_cost'])
+            
+            # Submit this cycle's orders together and wait for their fills concurrently
+            if orders:
+                results = self.order_executor.place_market_orders(orders)
+                record_trade = getattr(self.risk_manager, 'record_trade', None)
+                for (contract, action, quantity), entry_cost, order_result in zip(orders, entry_costs, results):
                     if order_result and 'fill_price' in order_result:
                         # Record the transaction
                         self.portfolio.record_transaction(
-                            contract, 'SELL', abs(position['quantity']), 
-                            order_result['fill_price'])
+                            contract, action, quantity, order_result['fill_price'])
+                        
+                        # Feed closed trades to risk managers that track win rates
+                        if entry_cost is not None and record_trade:
+                            record_trade(contract.symbol, order_result['fill_price'] > entry_cost)
             
             # Output portfolio summary
             performance = self.portfolio.get_performance()
-            logger.info(f"Portfolio value: ${self.portfolio.get_total_value():.2f} "
-                       f"(Return: {performance['total_return_pct']:.2f}%)")
+            logger.info("Portfolio value: $%.2f (Return: %.2f%%)",
+                        self.portfolio.get_total_value(), performance['total_return_pct'])
             
             logger.info("Trading cycle completed")
             
         except Exception as e:
-            logger.error(f"Error during trading cycle: {e}")
+            logger.error("Error during trading cycle: %s", e)
     
     def run(self):
         """Run the trading bot."""
@@ -101,13 +127,15 @@ class EcoETFBot:
         try:
             while self.running:
                 self.execute_cycle()
-                logger.info(f"Waiting {EXECUTION_INTERVAL} seconds until next cycle")
-                time.sleep(EXECUTION_INTERVAL)
+                logger.info("Waiting %s seconds until next cycle", EXECUTION_INTERVAL)
+                # Sleep on the IB event loop so pushed ticks and account
+                # updates keep being processed between cycles
+                self.connection.ensure_connection().sleep(EXECUTION_INTERVAL)
                 
         except KeyboardInterrupt:
             logger.info("Bot stopped by user")
         except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+            logger.error("Unexpected error: %s", e)
         finally:
             self.stop()
     
@@ -120,6 +148,9 @@ class EcoETFBot:
             # Unsubscribe from market data
             self.market_data.unsubscribe_all()
             
+            # Release the strategy's reusable thread pools
+            self.strategy.close()
+            
             # Export transaction history
             self.portfolio.export_transactions()
             
@@ -128,6 +159,6 @@ class EcoETFBot:
             
             logger.info("Bot resources cleaned up")
         except Exception as e:
-            logger.error(f"Error during cleanup: {e}")
+            logger.error("Error during cleanup: %s", e)
             
         logger.info("Bot stopped")
\ No newline at end of file
@@ -1,7 +1,10 @@
 """IBKR connection management."""
+import asyncio
 import logging
+import socket
+import time
 from ib_insync import IB
-from config.settings import IB_HOST, IB_PORT, CLIENT_ID
+from config.settings import IB_HOST, IB_PORT, CLIENT_ID, CONNECT_ATTEMPTS, RECONNECT_MAX_DELAY
 
 logger = logging.getLogger('core.connection')
 
@@ -12,31 +15,94 @@ class IBConnection:
         """Initialize the IB connection."""
         self.ib = IB()
         self.connected = False
+        self._closing = False  # Set while we disconnect on purpose
+        self._reconnect_task = None  # Background reconnect after a drop
+        self._connecting = False  # Set while connect() is retrying in the foreground
+        self.ib.disconnectedEvent += self._on_disconnected
     
     def connect(self):
-        """Connect to IB TWS/Gateway."""
+        """Connect to IB TWS/Gateway, retrying with exponential backoff."""
         if self.connected:
             logger.info("Already connected to IBKR")
             return self.ib
         
+        # Only one path may call ib.connect: let an in-flight background
+        # reconnect finish, and retry here only if it gave up
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            self.ib.run(self._reconnect_task)
+            if self.connected and self.ib.isConnected():
+                return self.ib
+        
+        self._closing = False
+        self._connecting = True
         try:
-            self.ib.connect(IB_HOST, IB_PORT, clientId=CLIENT_ID)
-            self.connected = True
-            logger.info("Successfully connected to IBKR")
-            return self.ib
+            delay = 1
+            for attempt in range(1, CONNECT_ATTEMPTS + 1):
+                try:
+                    self.ib.connect(IB_HOST, IB_PORT, clientId=CLIENT_ID)
+                    break
+                except Exception as e:
+                    if attempt == CONNECT_ATTEMPTS:
+                        logger.error("Failed to connect to IBKR: %s", e)
+                        raise
+                    logger.warning("Connection attempt %s failed (%s), retrying in %ss", attempt, e, delay)
+                    time.sleep(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        finally:
+            self._connecting = False
+        
+        self._on_connected()
+        logger.info("Successfully connected to IBKR")
+        return self.ib
+    
+    def _on_connected(self):
+        """Mark the connection live and tune its socket."""
+        self.connected = True
+        
+        try:
+            sock = self.ib.client.conn.transport.get_extra_info('socket')
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
         except Exception as e:
-            logger.error(f"Failed to connect to IBKR: {e}")
-            raise
+            logger.debug("Could not set socket options: %s", e)
+    
+    def _on_disconnected(self):
+        """Start reconnecting in the background when the gateway drops us."""
+        self.connected = False
+        if self._closing or self._connecting:
+            return
+        
+        logger.warning("Lost connection to IBKR, reconnecting")
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.ensure_future(self._reconnect())
+    
+    async def _reconnect(self):
+        """Reconnect on the event loop with exponential backoff."""
+        delay = 1
+        for attempt in range(1, CONNECT_ATTEMPTS + 1):
+            try:
+                await self.ib.connectAsync(IB_HOST, IB_PORT, clientId=CLIENT_ID)
+                self._on_connected()
+                logger.info("Reconnected to IBKR")
+                return
+            except Exception as e:
+                logger.warning("Reconnect attempt %s failed (%s), retrying in %ss", attempt, e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        
+        logger.error("Giving up on background reconnect to IBKR")
     
     def disconnect(self):
         """Disconnect from IB."""
         if self.connected:
+            self._closing = True
             self.ib.disconnect()
             self.connected = False
             logger.info("Disconnected from IBKR")
     
     def ensure_connection(self):
         """Ensure that we have an active connection to IB."""
+        # connect() waits for any in-flight background reconnect first
         if not self.connected or not self.ib.isConnected():
             return self.connect()
-        return self.ib
\ No newline at end of file
+        return self.ib
@@ -1,10 +1,21 @@
 """Portfolio management functionality."""
 import logging
+import time
 import pandas as pd
-from datetime import datetime
+from config.settings import ACCOUNT_SUMMARY_TTL
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
 
 logger = logging.getLogger('core.portfolio')
 
+# Columns of the transaction history, stored one list per field.
+# 'date' holds epoch nanoseconds (UTC) and is converted to timestamps on export.
+TRANSACTION_FIELDS = ('date', 'symbol', 'action', 'quantity', 'price', 'value', 'commission')
+
 class Portfolio:
     """Manages the trading portfolio."""
     
@@ -12,9 +23,15 @@ class Portfolio:
         """Initialize with an IB connection."""
         self.ib_connection = ib_connection
         self.positions = {}  # Current positions
-        self.transactions = []  # Transaction history
+        self._transactions = {field: [] for field in TRANSACTION_FIELDS}  # Transaction history
         self.starting_cash = 0  # Starting cash amount
         self.current_cash = 0  # Current cash amount
+        self._account_summary = {}  # Tag -> value from the last accountSummary() call
+        self._account_summary_ts = 0  # When the summary was last fetched
+        self._cash_subscribed = False  # True once accountSummaryEvent is wired up
+        self._positions_subscribed = False  # True once updatePortfolioEvent is wired up
+        self._cached_total = None  # Total value, cleared whenever cash or positions change
+        self.version = 0  # Bumped on every cash or position change so callers can cache derived values
     
     def initialize(self):
         """Initialize portfolio with account data."""
@@ -22,97 +39,171 @@ class Portfolio:
         
         try:
             # Get account summary
-            account_summary = ib.accountSummary()
+            account_summary = self.get_account_summary()
             
             # Find cash balance
-            for summary in account_summary:
-                if summary.tag == 'TotalCashValue':
-                    self.starting_cash = float(summary.value)
-                    self.current_cash = float(summary.value)
-                    break
+            if 'TotalCashValue' in account_summary:
+                self.starting_cash = float(account_summary['TotalCashValue'])
+                self.current_cash = self.starting_cash
+                self._invalidate()
             
-            logger.info(f"Portfolio initialized with {self.current_cash} cash")
+            # Keep cash updated as IB pushes account summary changes
+            if not self._cash_subscribed:
+                ib.accountSummaryEvent += self._on_account_summary
+                self._cash_subscribed = True
             
-            # Get current positions
-            self.update_positions()
+            logger.info("Portfolio initialized with %s cash", self.current_cash)
+            
+            # Load the initial snapshot, then keep positions updated as IB pushes changes
+            self.refresh(ib.portfolio())
+            if not self._positions_subscribed:
+                ib.updatePortfolioEvent += self._on_portfolio_update
+                self._positions_subscribed = True
             
         except Exception as e:
-            logger.error(f"Error initializing portfolio: {e}")
+            logger.error("Error initializing portfolio: %s", e)
     
     def update_positions(self):
-        """Update current positions from IB."""
+        """Update current positions from IB.
+        
+        Once subscribed, updatePortfolioEvent keeps positions current and
+        this just returns them.
+        """
+        if self._positions_subscribed:
+            return self.positions
+        
         ib = self.ib_connection.ensure_connection()
         
         try:
             # Get current positions
-            portfolio_items = ib.portfolio()
+            return self.refresh(ib.portfolio())
             
+        except Exception as e:
+            logger.error("Error updating positions: %s", e)
+            return {}
+    
+    def refresh(self, portfolio_items):
+        """Update current positions from already-fetched IB portfolio items."""
+        try:
             # Reset positions
             self.positions = {}
+            self._invalidate()
             
             # Update with current positions
             for item in portfolio_items:
-                symbol = item.contract.symbol
-                if item.position != 0:
-                    self.positions[symbol] = {
-                        'contract': item.contract,
-                        'quantity': item.position,
-                        'avg_cost': item.avgCost,
-                        'market_price': item.marketPrice,
-                        'market_value': item.marketValue,
-                        'unrealized_pnl': item.unrealizedPNL,
-                        'realized_pnl': item.realizedPNL
-                    }
+                self._apply_portfolio_item(item)
             
             # Update cash balance
             self.update_cash()
             
-            logger.info(f"Portfolio updated: {len(self.positions)} positions, {self.current_cash} cash")
+            logger.info("Portfolio updated: %s positions, %s cash", len(self.positions), self.current_cash)
             return self.positions
             
         except Exception as e:
-            logger.error(f"Error updating positions: {e}")
+            logger.error("Error updating positions: %s", e)
             return {}
     
+    def _apply_portfolio_item(self, item):
+        """Apply a single IB portfolio item to the tracked positions."""
+        symbol = item.contract.symbol
+        if item.position != 0:
+            self.positions[symbol] = {
+                'contract': item.contract,
+                'quantity': item.position,
+                'avg_cost': item.avgCost,
+                'market_price': item.marketPrice,
+                'market_value': item.marketValue,
+                'unrealized_pnl': item.unrealizedPNL,
+                'realized_pnl': item.realizedPNL
+            }
+        else:
+            self.positions.pop(symbol, None)
+        self._invalidate()
+    
+    def _on_portfolio_update(self, item):
+        """Handle a portfolio item pushed by IB."""
+        try:
+            self._apply_portfolio_item(item)
+        except Exception as e:
+            logger.error("Error handling portfolio update: %s", e)
+    
+    def get_account_summary(self, max_age=ACCOUNT_SUMMARY_TTL):
+        """Get the account summary as a tag -> value dict.
+        
+        Results are cached for max_age seconds so repeated calls within a
+        trading cycle don't each cost an IB round-trip.
+        """
+        if self._account_summary and time.monotonic() - self._account_summary_ts < max_age:
+            return self._account_summary
+        
+        ib = self.ib_connection.ensure_connection()
+        self._account_summary = {summary.tag: summary.value for summary in ib.accountSummary()}
+        self._account_summary_ts = time.monotonic()
+        return self._account_summary
+    
+    def _on_account_summary(self, value):
+        """Handle an account summary update pushed by IB."""
+        self._account_summary[value.tag] = value.value
+        if value.tag == 'TotalCashValue':
+            self.current_cash = float(value.value)
+            self._invalidate()
+    
     def update_cash(self):
         """Update current cash balance."""
-        ib = self.ib_connection.ensure_connection()
+        # Pushed updates already keep current_cash fresh
+        if self._cash_subscribed:
+            return self.current_cash
         
         try:
-            # Get account summary
-            account_summary = ib.accountSummary()
-            
-            # Find cash balance
-            for summary in account_summary:
-                if summary.tag == 'TotalCashValue':
-                    self.current_cash = float(summary.value)
-                    break
+            account_summary = self.get_account_summary()
+            if 'TotalCashValue' in account_summary:
+                self.current_cash = float(account_summary['TotalCashValue'])
+                self._invalidate()
                     
         except Exception as e:
-            logger.error(f"Error updating cash balance: {e}")
+            logger.error("Error updating cash balance: %s", e)
+        
+        return self.current_cash
+    
+    @property
+    def transactions(self):
+        """Transaction history as a list of per-trade dicts."""
+        columns = dict(self._transactions, date=list(pd.to_datetime(self._transactions['date'], unit='ns')))
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
+    
+    @property
+    def transaction_count(self):
+        """Number of recorded transactions."""
+        return len(self._transactions['symbol'])
     
     def record_transaction(self, contract, action, quantity, price, commission=0):
         """Record a transaction in the transaction history."""
-        transaction = {
-            'date': datetime.now(),
-            'symbol': contract.symbol,
-            'action': action,
-            'quantity': quantity,
-            'price': price,
-            'value': quantity * price,
-            'commission': commission
-        }
+        columns = self._transactions
+        columns['date'].append(time.time_ns())
+        columns['symbol'].append(contract.symbol)
+        columns['action'].append(action)
+        columns['quantity'].append(quantity)
+        columns['price'].append(price)
+        columns['value'].append(quantity * price)
+        columns['commission'].append(commission)
+        self._invalidate()
         
-        self.transactions.append(transaction)
-        logger.info(f"Recorded transaction: {action} {quantity} {contract.symbol} @ {price}")
+        logger.info("Recorded transaction: %s %s %s @ %s", action, quantity, contract.symbol, price)
     
     def get_position_value(self):
         """Get the current value of all positions."""
         return sum(pos['market_value'] for pos in self.positions.values())
     
+    def _invalidate(self):
+        """Drop the cached total and bump the version after cash or positions change."""
+        self._cached_total = None
+        self.version += 1
+    
     def get_total_value(self):
         """Get the total portfolio value (positions + cash)."""
-        return self.get_position_value() + self.current_cash
+        if self._cached_total is None:
+            self._cached_total = self.get_position_value() + self.current_cash
+        return self._cached_total
     
     def get_performance(self):
         """Calculate portfolio performance metrics."""
@@ -137,15 +228,25 @@ class Portfolio:
     
     def export_transactions(self, filename='transactions.csv'):
         """Export transactions to a CSV file."""
-        if not self.transactions:
+        if not self.transaction_count:
             logger.warning("No transactions to export")
             return False
             
         try:
-            df = pd.DataFrame(self.transactions)
-            df.to_csv(filename, index=False)
-            logger.info(f"Exported {len(self.transactions)} transactions to {filename}")
+            # Columns go straight in, no per-row dicts to infer from
+            if pa is not None:
+                # Arrow writes the CSV from native memory
+                columns = dict(self._transactions,
+                               date=pa.array(self._transactions['date'], type=pa.timestamp('ns')))
+                table = pa.table({field: columns[field] for field in TRANSACTION_FIELDS})
+                pa_csv.write_csv(table, filename)
+            else:
+                columns = dict(self._transactions,
+                               date=pd.to_datetime(self._transactions['date'], unit='ns'))
+                df = pd.DataFrame(columns, columns=TRANSACTION_FIELDS)
+                df.to_csv(filename, index=False)
+            logger.info("Exported %s transactions to %s", self.transaction_count, filename)
             return True
         except Exception as e:
-            logger.error(f"Error exporting transactions: {e}")
+            logger.error("Error exporting transactions: %s", e)
             return False
\ No newline at end of file
@@ -1,20 +1,66 @@
 """Functions for retrieving historical market data."""
+import asyncio
 import logging
+import time
+import numpy as np
 import pandas as pd
 from ib_insync import util
+from config.settings import MAX_CONCURRENT_HISTORICAL_REQUESTS, HISTORICAL_CACHE_TTL
 
 logger = logging.getLogger('data.historical')
 
+# Bar columns held as float32; indicator thresholds don't need float64 precision
+FLOAT32_COLUMNS = ('open', 'high', 'low', 'close', 'average', 'volume')
+
+def bars_to_df(bars):
+    """Convert IB bars to a DataFrame with float32 price and volume columns."""
+    df = util.df(bars)
+    return df.astype({col: np.float32 for col in FLOAT32_COLUMNS if col in df.columns}, copy=False)
+
+def rolling_mean(values, window):
+    """Trailing moving average of a 1-D array, NaN until the window fills."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).mean(axis=1)
+    return out
+
+def rolling_std(values, window):
+    """Trailing sample standard deviation of a 1-D array, NaN until the window fills."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).std(axis=1, ddof=1)
+    return out
+
 class HistoricalDataProvider:
     """Provider for historical market data."""
     
     def __init__(self, ib_connection):
         """Initialize with an IB connection."""
         self.ib_connection = ib_connection
+        self._request_slots = None  # Semaphore bounding in-flight requests
+        self._cache = {}  # Request key -> (fetch time, DataFrame)
+    
+    def _cached(self, key):
+        """Get a cached DataFrame for a request key if it's still fresh."""
+        entry = self._cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] < HISTORICAL_CACHE_TTL:
+            return entry[1]
+        return None
+    
+    def _store(self, key, df):
+        """Cache a fetched DataFrame under its request key."""
+        if df is not None:
+            self._cache[key] = (time.monotonic(), df)
+        return df
     
     def get_historical_data(self, contract, duration='20 D', bar_size='1 day',
                            what_to_show='MIDPOINT', use_rth=True):
         """Get historical data for a contract."""
+        key = (contract.symbol, duration, bar_size, what_to_show, use_rth)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
         ib = self.ib_connection.ensure_connection()
         
         try:
@@ -28,30 +74,98 @@ class HistoricalDataProvider:
             )
             
             if not bars:
-                logger.warning(f"No historical data returned for {contract.symbol}")
+                logger.warning("No historical data returned for %s", contract.symbol)
+                return None
+                
+            return self._store(key, bars_to_df(bars))
+            
+        except Exception as e:
+            logger.error("Error getting historical data for %s: %s", contract.symbol, e)
+            return None
+    
+    async def get_historical_data_async(self, contract, duration='20 D', bar_size='1 day',
+                                        what_to_show='MIDPOINT', use_rth=True):
+        """Get historical data for a contract without blocking the event loop."""
+        key = (contract.symbol, duration, bar_size, what_to_show, use_rth)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
+        ib = self.ib_connection.ib
+        
+        # Created lazily so it binds to the loop ib_insync is running on
+        if self._request_slots is None:
+            self._request_slots = asyncio.Semaphore(MAX_CONCURRENT_HISTORICAL_REQUESTS)
+        
+        try:
+            async with self._request_slots:
+                bars = await ib.reqHistoricalDataAsync(
+                    contract,
+                    endDateTime='',
+                    durationStr=duration,
+                    barSizeSetting=bar_size,
+                    whatToShow=what_to_show,
+                    useRTH=use_rth
+                )
+            
+            if not bars:
+                logger.warning("No historical data returned for %s", contract.symbol)
                 return None
                 
-            df = util.df(bars)
-            return df
+            return self._store(key, bars_to_df(bars))
             
         except Exception as e:
-            logger.error(f"Error getting historical data for {contract.symbol}: {e}")
+            logger.error("Error getting historical data for %s: %s", contract.symbol, e)
             return None
     
+    def get_batch(self, contracts, **kwargs):
+        """Get historical data for several contracts concurrently.
+        
+        Args:
+            contracts: List of IB contract objects
+            **kwargs: Request options passed to get_historical_data_async
+            
+        Returns:
+            list: DataFrames (or None) in the same order as contracts
+        """
+        # Serve fresh cache hits directly and send only the misses to IB
+        options = {'duration': '20 D', 'bar_size': '1 day', 'what_to_show': 'MIDPOINT', 'use_rth': True}
+        options.update(kwargs)
+        frames = [self._cached((contract.symbol, options['duration'], options['bar_size'],
+                                options['what_to_show'], options['use_rth']))
+                  for contract in contracts]
+        missing = [i for i, df in enumerate(frames) if df is None]
+        if not missing:
+            return frames
+        
+        ib = self.ib_connection.ensure_connection()
+        fetched = ib.run(asyncio.gather(
+            *[self.get_historical_data_async(contracts[i], **options) for i in missing]))
+        for i, df in zip(missing, fetched):
+            frames[i] = df
+        return frames
+    
     def calculate_indicators(self, df, sma_short=5, sma_long=20):
         """Calculate technical indicators on a dataframe."""
         if df is None or len(df) < sma_long:
             return None
             
-        # Make a copy to avoid modifying the original
-        result = df.copy()
+        close = df['close'].to_numpy(dtype=np.float64)
         
-        # Calculate simple moving averages
-        result[f'SMA{sma_short}'] = result['close'].rolling(sma_short).mean()
-        result[f'SMA{sma_long}'] = result['close'].rolling(sma_long).mean()
+        # Daily returns
+        returns = np.empty(len(close))
+        returns[0] = np.nan
+        returns[1:] = np.diff(close) / close[:-1]
         
-        # Calculate volatility (20-day rolling standard deviation of returns)
-        result['returns'] = result['close'].pct_change()
-        result['volatility'] = result['returns'].rolling(20).std() * (252 ** 0.5)  # Annualized
+        # Build all indicator columns in one frame and attach them in a single join,
+        # replacing any left over from an earlier pass over the same frame
+        indicators = pd.DataFrame({
+            # Simple moving averages
+            f'SMA{sma_short}': rolling_mean(close, sma_short),
+            f'SMA{sma_long}': rolling_mean(close, sma_long),
+            'returns': returns,
+            # Volatility (20-day rolling standard deviation of returns)
+            'volatility': rolling_std(returns, 20) * (252 ** 0.5),  # Annualized
+        }, index=df.index)
         
-        return result
\ No newline at end of file
+        return df.drop(columns=indicators.columns, errors='ignore').join(indicators)
\ No newline at end of file
@@ -1,9 +1,21 @@
 """Real-time market data functionality."""
+import asyncio
 import logging
 from ib_insync import util
 
 logger = logging.getLogger('data.market_data')
 
+def _market_price(ticker):
+    """Return the ticker's market price, or None until a valid one arrives."""
+    price = ticker.marketPrice()
+    return price if price > 0 else None
+
+def _bid_ask(ticker):
+    """Return the ticker's bid/ask quote, or None until both sides are valid."""
+    if ticker.bid > 0 and ticker.ask > 0:
+        return {'bid': ticker.bid, 'ask': ticker.ask}
+    return None
+
 class MarketDataProvider:
     """Provider for real-time market data."""
     
@@ -11,6 +23,65 @@ class MarketDataProvider:
         """Initialize with an IB connection."""
         self.ib_connection = ib_connection
         self.active_subscriptions = {}  # Symbol -> ticker
+        self._waiters = {}  # Symbol -> list of (extract, future) awaiting a tick
+    
+    def _subscribe(self, ib, contract):
+        """Get the live ticker for a contract, subscribing if needed."""
+        if contract.symbol in self.active_subscriptions:
+            # We're already subscribed to this ticker
+            return self.active_subscriptions[contract.symbol]
+        
+        # Create a new subscription and listen for pushed ticks
+        ticker = ib.reqMktData(contract)
+        ticker.updateEvent += self._on_tick
+        self.active_subscriptions[contract.symbol] = ticker
+        return ticker
+    
+    def _on_tick(self, ticker):
+        """Resolve any waiters whose data arrived with this tick."""
+        for extract, future in self._waiters.get(ticker.contract.symbol, []):
+            if future.done():
+                continue
+            value = extract(ticker)
+            if value is not None:
+                future.set_result(value)
+    
+    async def _wait_for(self, ticker, extract, timeout):
+        """Wait until extract(ticker) yields a value or the timeout expires."""
+        value = extract(ticker)
+        if value is not None:
+            return value
+        
+        symbol = ticker.contract.symbol
+        waiter = (extract, asyncio.get_running_loop().create_future())
+        self._waiters.setdefault(symbol, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._waiters[symbol].remove(waiter)
+    
+    async def get_market_price_async(self, contract, timeout=5):
+        """Wait for the current market price of a contract.
+        
+        Args:
+            contract: IB contract object
+            timeout: Time to wait for data in seconds
+            
+        Returns:
+            float: Current market price or None if unavailable
+        """
+        try:
+            ticker = self._subscribe(self.ib_connection.ib, contract)
+            last_price = await self._wait_for(ticker, _market_price, timeout)
+            if last_price is None:
+                logger.warning("Couldn't get market price for %s within timeout", contract.symbol)
+            return last_price
+            
+        except Exception as e:
+            logger.error("Error getting market price for %s: %s", contract.symbol, e)
+            return None
     
     def get_market_price(self, contract, timeout=5):
         """Get the current market price for a contract.
@@ -23,71 +94,51 @@ class MarketDataProvider:
             float: Current market price or None if unavailable
         """
         ib = self.ib_connection.ensure_connection()
-        
+        return ib.run(self.get_market_price_async(contract, timeout))
+    
+    async def get_bid_ask_async(self, contract, timeout=5):
+        """Wait for the current bid and ask prices of a contract."""
         try:
-            if contract.symbol in self.active_subscriptions:
-                # We're already subscribed to this ticker
-                ticker = self.active_subscriptions[contract.symbol]
-            else:
-                # Create a new subscription
-                ticker = ib.reqMktData(contract)
-                self.active_subscriptions[contract.symbol] = ticker
-            
-            # Wait for data to arrive
-            for _ in range(timeout):
-                ib.waitOnUpdate(timeout=1)
-                last_price = ticker.marketPrice()
-                if last_price > 0:
-                    return last_price
-            
-            logger.warning(f"Couldn't get market price for {contract.symbol} within timeout")
-            return None
+            ticker = self._subscribe(self.ib_connection.ib, contract)
+            quote = await self._wait_for(ticker, _bid_ask, timeout)
+            if quote is None:
+                logger.warning("Couldn't get bid/ask for %s within timeout", contract.symbol)
+            return quote
             
         except Exception as e:
-            logger.error(f"Error getting market price for {contract.symbol}: {e}")
+            logger.error("Error getting bid/ask for %s: %s", contract.symbol, e)
             return None
     
     def get_bid_ask(self, contract, timeout=5):
         """Get the current bid and ask prices for a contract."""
         ib = self.ib_connection.ensure_connection()
-        
-        try:
-            if contract.symbol in self.active_subscriptions:
-                ticker = self.active_subscriptions[contract.symbol]
-            else:
-                ticker = ib.reqMktData(contract)
-                self.active_subscriptions[contract.symbol] = ticker
-            
-            # Wait for data to arrive
-            for _ in range(timeout):
-                ib.waitOnUpdate(timeout=1)
-                bid = ticker.bid
-                ask = ticker.ask
-                if bid > 0 and ask > 0:
-                    return {'bid': bid, 'ask': ask}
-            
-            logger.warning(f"Couldn't get bid/ask for {contract.symbol} within timeout")
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error getting bid/ask for {contract.symbol}: {e}")
-            return None
+        return ib.run(self.get_bid_ask_async(contract, timeout))
     
     def unsubscribe(self, contract):
         """Unsubscribe from market data for a contract."""
         ib = self.ib_connection.ensure_connection()
         
         if contract.symbol in self.active_subscriptions:
+            ticker = self.active_subscriptions.pop(contract.symbol)
+            ticker.updateEvent -= self._on_tick
             ib.cancelMktData(contract)
-            del self.active_subscriptions[contract.symbol]
-            logger.info(f"Unsubscribed from market data for {contract.symbol}")
+            logger.info("Unsubscribed from market data for %s", contract.symbol)
     
     def unsubscribe_all(self):
         """Unsubscribe from all market data."""
         ib = self.ib_connection.ensure_connection()
         
-        for symbol, ticker in list(self.active_subscriptions.items()):
-            ib.cancelMktData(ticker.contract)
-            logger.info(f"Unsubscribed from market data for {symbol}")
+        # Snapshot first so a failed cancel can't leave the dict half-mutated
+        subscriptions = list(self.active_subscriptions.items())
+        self.active_subscriptions.clear()
+        
+        for symbol, ticker in subscriptions:
+            ticker.updateEvent -= self._on_tick
+            try:
+                ib.cancelMktData(ticker.contract)
+                logger.info("Unsubscribed from market data for %s", symbol)
+            except Exception as e:
+                logger.error("Error unsubscribing from market data for %s: %s", symbol, e)
         
-        self.active_subscriptions = {}
\ No newline at end of file
+        # Flush all cancel requests in a single loop iteration
+        ib.sleep(0)
\ No newline at end of file
@@ -1,16 +1,25 @@
 """Order execution functionality."""
+import asyncio
 import logging
 from ib_insync import MarketOrder, StopOrder, LimitOrder
 
 logger = logging.getLogger('execution.order')
 
+ORDER_FILL_TIMEOUT = 50  # Seconds to wait for a market order to fill
+
+async def _wait_until_done(trade):
+    """Wait for a trade to reach a final state via its status events."""
+    while not trade.isDone():
+        await trade.statusEvent
+
 class OrderExecutor:
     """Handles order execution."""
     
-    def __init__(self, ib_connection, market_hours_checker, is_paper=False):
-        """Initialize with an IB connection."""
+    def __init__(self, ib_connection, market_hours_checker, market_data, is_paper=False):
+        """Initialize with an IB connection and the shared market data provider."""
         self.ib_connection = ib_connection
         self.market_hours_checker = market_hours_checker
+        self.market_data = market_data
         self.is_paper = is_paper
     
     def place_market_order(self, contract, action, quantity):
@@ -24,12 +33,42 @@ class OrderExecutor:
         Returns:
             dict: Order information if successful, None otherwise
         """
+        return self.place_market_orders([(contract, action, quantity)])[0]
+    
+    def place_market_orders(self, orders):
+        """Place several market orders together and wait for them concurrently.
+        
+        Args:
+            orders: List of (contract, action, quantity) tuples
+            
+        Returns:
+            list: Order information (or None) for each order, in the same order
+        """
         ib = self.ib_connection.ensure_connection()
+        results = [None] * len(orders)
         
         # Check if market is open
-        if not self.market_hours_checker.is_market_open(contract):
-            logger.warning(f"Market closed for {contract.symbol}, skipping order")
-            return None
+        pending = []
+        for i, (contract, action, quantity) in enumerate(orders):
+            if not self.market_hours_checker.is_market_open(contract):
+                logger.warning("Market closed for %s, skipping order", contract.symbol)
+                continue
+            pending.append(i)
+        
+        if pending:
+            filled = ib.run(asyncio.gather(
+                *[self.place_market_order_async(*orders[i]) for i in pending]))
+            for i, result in zip(pending, filled):
+                results[i] = result
+        
+        return results
+    
+    async def place_market_order_async(self, contract, action, quantity):
+        """Place a market order and wait for it to fill without blocking the event loop.
+        
+        The caller is responsible for checking that the market is open.
+        """
+        ib = self.ib_connection.ib
         
         try:
             # Create and place the order
@@ -37,19 +76,11 @@ class OrderExecutor:
             
             # Log paper trading if enabled
             if self.is_paper:
-                logger.info(f"[PAPER] Placed {action} market order for {quantity} shares of {contract.symbol}")
-                
-                # Simulate a fill with current market price
-                current_price = None
-                ticker = ib.reqMktData(contract)
-                for _ in range(5):  # Try for 5 seconds
-                    ib.waitOnUpdate(timeout=1)
-                    current_price = ticker.marketPrice()
-                    if current_price > 0:
-                        break
+                logger.info("[PAPER] Placed %s market order for %s shares of %s", action, quantity, contract.symbol)
                 
-                # Cancel market data subscription
-                ib.cancelMktData(contract)
+                # Simulate a fill with current market price from the
+                # persistent subscription
+                current_price = await self.market_data.get_market_price_async(contract, timeout=5)
                 
                 if current_price and current_price > 0:
                     # Return simulated fill info
@@ -66,18 +97,18 @@ class OrderExecutor:
             
             # Real trading
             trade = ib.placeOrder(contract, order)
-            logger.info(f"Placed {action} market order for {quantity} shares of {contract.symbol}")
+            logger.info("Placed %s market order for %s shares of %s", action, quantity, contract.symbol)
             
             # Wait for order to fill
-            for i in range(10):  # Try for a limited time
-                ib.waitOnUpdate(timeout=5)
-                if trade.isDone():
-                    break
+            try:
+                await asyncio.wait_for(_wait_until_done(trade), ORDER_FILL_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
             
             # Check status
             if trade.orderStatus.status == 'Filled':
                 fill_price = trade.orderStatus.avgFillPrice
-                logger.info(f"Order filled at {fill_price}")
+                logger.info("Order filled at %s", fill_price)
                 
                 return {
                     'status': 'filled',
@@ -88,11 +119,11 @@ class OrderExecutor:
                     'commission': trade.orderStatus.commission if hasattr(trade.orderStatus, 'commission') else 0
                 }
             else:
-                logger.error(f"Order not filled: {trade.orderStatus.status}")
+                logger.error("Order not filled: %s", trade.orderStatus.status)
                 return None
                 
         except Exception as e:
-            logger.error(f"Error placing order for {contract.symbol}: {e}")
+            logger.error("Error placing order for %s: %s", contract.symbol, e)
             return None
     
     def place_stop_order(self, contract, action, quantity, stop_price):
@@ -101,7 +132,7 @@ class OrderExecutor:
         
         # Paper trading simulation
         if self.is_paper:
-            logger.info(f"[PAPER] Placed {action} stop order for {quantity} shares of {contract.symbol} at {stop_price}")
+            logger.info("[PAPER] Placed %s stop order for %s shares of %s at %s", action, quantity, contract.symbol, stop_price)
             return {
                 'status': 'submitted',
                 'stop_price': stop_price,
@@ -113,8 +144,8 @@ class OrderExecutor:
         try:
             order = StopOrder(action, quantity, stop_price)
             trade = ib.placeOrder(contract, order)
-            logger.info(f"Placed {action} stop order for {quantity} shares of {contract.symbol} at {stop_price}")
+            logger.info("Placed %s stop order for %s shares of %s at %s", action, quantity, contract.symbol, stop_price)
             return trade
         except Exception as e:
-            logger.error(f"Error placing stop order for {contract.symbol}: {e}")
+            logger.error("Error placing stop order for %s: %s", contract.symbol, e)
             return None
\ No newline at end of file
@@ -1,5 +1,7 @@
 """Position management functionality."""
 import logging
+import time
+import numpy as np
 from config.settings import STOP_LOSS_PCT, TAKE_PROFIT_PCT
 
 logger = logging.getLogger('execution.position')
@@ -12,66 +14,157 @@ class PositionManager:
         self.ib_connection = ib_connection
         self.order_executor = order_executor
         self.positions = {}  # Symbol -> position data
+        self._last_refresh_ts = None  # When positions were last refreshed
+        self.on_trade_closed = None  # Optional callback(symbol, won) for each filled exit placed here
+        self.trailing_stops = None  # Optional risk manager whose bulk_should_exit() adds trailing-stop exits
+        
+        # Parallel arrays over tracked positions for vectorized stop checks
+        self._symbols = []  # Symbol at each array index
+        self._index = {}  # Symbol -> array index
+        self._prices = np.empty(0)
+        self._stops = np.empty(0)
+        self._takes = np.empty(0)
+        self._qty_signs = np.empty(0)
+        
+        # Keep positions updated as IB pushes portfolio changes
+        self.ib_connection.ib.updatePortfolioEvent += self._on_portfolio_update
     
     def update_positions(self):
-        """Update the current positions from IB."""
+        """Update the current positions from IB.
+        
+        Only the initial snapshot is fetched; after that updatePortfolioEvent
+        keeps positions current.
+        """
+        if self._last_refresh_ts is not None:
+            return self.positions
+        
         ib = self.ib_connection.ensure_connection()
         
         # Get current positions from IB
-        portfolio = ib.portfolio()
-        
+        return self.refresh(ib.portfolio())
+    
+    def refresh(self, portfolio):
+        """Update position tracking from already-fetched IB portfolio items."""
         # Update our position tracking
         for item in portfolio:
-            symbol = item.contract.symbol
-            if item.position != 0:
-                if symbol not in self.positions:
-                    # New position we're tracking
-                    self.positions[symbol] = {
-                        'contract': item.contract,
-                        'quantity': item.position,
-                        'avg_cost': item.avgCost,
-                        'market_price': item.marketPrice,
-                        'market_value': item.marketValue,
-                        'stop_loss_price': item.avgCost * (1 - STOP_LOSS_PCT) if item.position > 0 else item.avgCost * (1 + STOP_LOSS_PCT),
-                        'take_profit_price': item.avgCost * (1 + TAKE_PROFIT_PCT) if item.position > 0 else item.avgCost * (1 - TAKE_PROFIT_PCT)
-                    }
-                else:
-                    # Update existing position
-                    self.positions[symbol].update({
-                        'quantity': item.position,
-                        'market_price': item.marketPrice,
-                        'market_value': item.marketValue
-                    })
-            elif symbol in self.positions:
-                # Position closed
-                del self.positions[symbol]
+            self._apply_portfolio_item(item)
         
-        logger.info(f"Updated positions: {len(self.positions)} active positions")
+        self._last_refresh_ts = time.monotonic()
+        logger.info("Updated positions: %s active positions", len(self.positions))
         return self.positions
     
+    def _apply_portfolio_item(self, item):
+        """Apply a single IB portfolio item to the tracked positions."""
+        symbol = item.contract.symbol
+        if item.position != 0:
+            if symbol not in self._index:
+                # New position we're tracking
+                self.positions[symbol] = {
+                    'contract': item.contract,
+                    'quantity': item.position,
+                    'avg_cost': item.avgCost,
+                    'market_price': item.marketPrice,
+                    'market_value': item.marketValue,
+                    'stop_loss_price': item.avgCost * (1 - STOP_LOSS_PCT) if item.position > 0 else item.avgCost * (1 + STOP_LOSS_PCT),
+                    'take_profit_price': item.avgCost * (1 + TAKE_PROFIT_PCT) if item.position > 0 else item.avgCost * (1 - TAKE_PROFIT_PCT)
+                }
+                self._rebuild_arrays()
+            else:
+                # Update existing position
+                self.positions[symbol].update({
+                    'quantity': item.position,
+                    'market_price': item.marketPrice,
+                    'market_value': item.marketValue
+                })
+                i = self._index[symbol]
+                self._prices[i] = item.marketPrice
+                self._qty_signs[i] = np.sign(item.position)
+        elif symbol in self.positions:
+            # Position closed
+            del self.positions[symbol]
+            self._rebuild_arrays()
+    
+    def _rebuild_arrays(self):
+        """Rebuild the position arrays after positions are added or removed."""
+        self._symbols = list(self.positions)
+        self._index = {symbol: i for i, symbol in enumerate(self._symbols)}
+        positions = [self.positions[symbol] for symbol in self._symbols]
+        self._prices = np.array([p['market_price'] for p in positions], dtype=float)
+        self._stops = np.array([p['stop_loss_price'] for p in positions], dtype=float)
+        self._takes = np.array([p['take_profit_price'] for p in positions], dtype=float)
+        self._qty_signs = np.sign(np.array([p['quantity'] for p in positions], dtype=float))
+    
+    def _on_portfolio_update(self, item):
+        """Handle a portfolio item pushed by IB."""
+        try:
+            self._apply_portfolio_item(item)
+        except Exception as e:
+            logger.error("Error handling portfolio update: %s", e)
+    
+    def _trailing_stop_hits(self):
+        """Check every long position's trailing stop in one vectorized pass.
+        
+        Returns:
+            np.ndarray: Boolean mask aligned with the position arrays
+        """
+        hits = np.zeros(len(self._symbols), dtype=bool)
+        manager = self.trailing_stops
+        if manager is None:
+            return hits
+        
+        # Track new long positions and forget stops of positions no longer held
+        for symbol in manager.stop_symbols():
+            if symbol not in self.positions or self.positions[symbol]['quantity'] <= 0:
+                manager.drop_trailing_stop(symbol)
+        for symbol in self._symbols:
+            position = self.positions[symbol]
+            if position['quantity'] > 0 and not manager.has_trailing_stop(symbol):
+                manager.calculate_trailing_stop(symbol, position['market_price'], position)
+        
+        order = manager.stop_symbols()
+        if not order:
+            return hits
+        prices = self._prices[[self._index[symbol] for symbol in order]]
+        stopped = manager.bulk_should_exit(prices)
+        for i in np.flatnonzero(stopped):
+            hits[self._index[order[i]]] = True
+        return hits
+    
     def manage_open_positions(self):
         """Check and manage existing positions (stop loss, etc)."""
         self.update_positions()
         
-        for symbol, position in list(self.positions.items()):
+        # Evaluate every position's stop loss and take profit in one pass
+        long = self._qty_signs > 0
+        short = self._qty_signs < 0
+        stop_hit = (long & (self._prices <= self._stops)) | (short & (self._prices >= self._stops))
+        trail_hit = long & self._trailing_stop_hits() & ~stop_hit
+        take_hit = long & (self._prices >= self._takes) & ~stop_hit & ~trail_hit
+        
+        # Snapshot breaches first; fills can reshape the arrays while orders run
+        reasons = np.where(stop_hit, 'Stop loss', np.where(trail_hit, 'Trailing stop', 'Take profit'))
+        breached = [(self._symbols[i], reasons[i]) for i in np.flatnonzero(stop_hit | trail_hit | take_hit)]
+        
+        for symbol, reason in breached:
+            position = self.positions.get(symbol)
+            if position is None:
+                continue
+            
             contract = position['contract']
             quantity = position['quantity']
             market_price = position['market_price']
+            avg_cost = position['avg_cost']  # Read now; the fill may drop the position
             
-            # Check stop loss
-            if quantity > 0 and market_price <= position['stop_loss_price']:
-                logger.info(f"Stop loss triggered for {symbol} at {market_price}")
-                self.order_executor.place_market_order(contract, 'SELL', abs(quantity))
-            
-            # Check take profit
-            elif quantity > 0 and market_price >= position['take_profit_price']:
-                logger.info(f"Take profit triggered for {symbol} at {market_price}")
-                self.order_executor.place_market_order(contract, 'SELL', abs(quantity))
+            if quantity > 0:
+                logger.info("%s triggered for %s at %s", reason, symbol, market_price)
+                result = self.order_executor.place_market_order(contract, 'SELL', abs(quantity))
+            else:
+                logger.info("Stop loss triggered for short position %s at %s", symbol, market_price)
+                result = self.order_executor.place_market_order(contract, 'BUY', abs(quantity))
             
-            # Short position stop loss
-            elif quantity < 0 and market_price >= position['stop_loss_price']:
-                logger.info(f"Stop loss triggered for short position {symbol} at {market_price}")
-                self.order_executor.place_market_order(contract, 'BUY', abs(quantity))
+            if self.on_trade_closed and result and 'fill_price' in result:
+                fill_price = result['fill_price']
+                self.on_trade_closed(symbol, fill_price > avg_cost if quantity > 0 else fill_price < avg_cost)
     
     def get_position_count(self):
         """Get the current number of positions."""
@@ -1,31 +1,17 @@
 """Main entry point for the Eco ETF Trading Bot."""
 import sys
 import time
+import asyncio
 import argparse
 import os
 import json
+import atexit
 from datetime import datetime, timedelta
-import pandas as pd
 
+# Heavy imports (pandas, ib_insync, strategies) are deferred to the code
+# paths that need them so --stats and --backtest start quickly
 from utils.logging_config import setup_logging
-from core.connection import IBConnection
-from core.bot import EcoETFBot
-from core.portfolio import Portfolio
-from data.historical import HistoricalDataProvider
-from data.market_data import MarketDataProvider
-from strategies.moving_average import MovingAverageCrossover
-from strategies.enhanced_ma import EnhancedMovingAverage
-from strategies.volatility import VolatilityBreakout
-from strategies.mean_reversion import MeanReversionStrategy
-from strategies.ensemble import EnsembleStrategy
-from execution.order import OrderExecutor
-from execution.position import PositionManager
-from utils.market_hours import MarketHoursChecker
-from utils.risk_management import RiskManager
-from utils.advanced_risk_management import AdvancedRiskManager
 from config.settings import EXECUTION_INTERVAL
-from config.symbols import ETF_LIST
-from tests.backtest import run_all_backtests
 
 # Create stats directory if it doesn't exist
 STATS_DIR = 'stats'
@@ -33,89 +19,136 @@ if not os.path.exists(STATS_DIR):
     os.makedirs(STATS_DIR)
 
 # Set up trade log file
-TRADE_LOG_FILE = os.path.join(STATS_DIR, 'trade_log.json')
+TRADE_LOG_FILE = os.path.join(STATS_DIR, 'trade_log.jsonl')
+TRADE_LOG_CHUNKSIZE = 100_000  # Trades parsed at a time when generating stats
+TRADE_LOG_FLUSH_EVERY = 10  # Trades buffered in memory before writing to the log
+
+# Serialized trades not yet written to the trade log
+_trade_buffer = []
+
+def flush_trade_log():
+    """Write any buffered trades to the trade log in one append."""
+    if not _trade_buffer:
+        return
+    
+    with open(TRADE_LOG_FILE, 'a') as f:
+        f.writelines(_trade_buffer)
+    _trade_buffer.clear()
+
+# Don't lose buffered trades on shutdown
+atexit.register(flush_trade_log)
 
 def log_trade(trade_data):
-    """Log trade details to a JSON file for stats tracking."""
+    """Log trade details to a JSON lines file for stats tracking.
+    
+    Trades are buffered and appended in batches of TRADE_LOG_FLUSH_EVERY.
+    """
     trade_data['timestamp'] = datetime.now().isoformat()
     
-    # Load existing trades
-    trades = []
-    if os.path.exists(TRADE_LOG_FILE):
-        try:
-            with open(TRADE_LOG_FILE, 'r') as f:
-                trades = json.load(f)
-        except json.JSONDecodeError:
-            # File exists but is empty or corrupted
-            trades = []
+    # One compact record per line; existing trades are never rewritten
+    _trade_buffer.append(json.dumps(trade_data, separators=(',', ':')) + '\n')
+    if len(_trade_buffer) >= TRADE_LOG_FLUSH_EVERY:
+        flush_trade_log()
+
+def group_totals(df, column):
+    """Aggregate trade count and P&L per value of column in one groupby pass."""
+    grouped = df.groupby(column, sort=False)
+    if 'profit' in df.columns:
+        return grouped['profit'].agg(total='sum', count='size')
+    totals = grouped.size().to_frame('count')
+    totals['total'] = 0
+    return totals
+
+def summarize_groups(partials):
+    """Combine per-chunk group totals into per-group performance stats."""
+    import pandas as pd
     
-    # Append new trade
-    trades.append(trade_data)
+    if not partials:
+        return {}
+    stats = pd.concat(partials).groupby(level=0, sort=False).sum()
     
-    # Save updated trades
-    with open(TRADE_LOG_FILE, 'w') as f:
-        json.dump(trades, f, indent=2)
+    return {
+        key: {
+            'total_trades': count,
+            'total_profit': total,
+            'avg_profit': total / count
+        }
+        for key, total, count in zip(stats.index, stats['total'], stats['count'])
+    }
 
 def generate_stats_summary():
-    """Generate statistics summary from trade log."""
+    """Generate statistics summary from trade log.
+    
+    The log is read in chunks of TRADE_LOG_CHUNKSIZE trades and the stats
+    accumulated across them, so memory stays bounded as the log grows.
+    """
+    flush_trade_log()
+    
     if not os.path.exists(TRADE_LOG_FILE):
         return "No trade data available."
     
     try:
-        with open(TRADE_LOG_FILE, 'r') as f:
-            trades = json.load(f)
+        import pandas as pd
         
-        if not trades:
+        if os.path.getsize(TRADE_LOG_FILE) == 0:
             return "No trades recorded yet."
         
-        # Convert to DataFrame for easier analysis
-        df = pd.DataFrame(trades)
-        
-        # Convert timestamp to datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
-        # Calculate basic stats
-        total_trades = len(df)
-        winning_trades = sum(df['profit'] > 0) if 'profit' in df.columns else 0
-        losing_trades = sum(df['profit'] < 0) if 'profit' in df.columns else 0
-        win_rate = winning_trades / total_trades if total_trades > 0 else 0
-        
-        # P&L stats
-        total_profit = df['profit'].sum() if 'profit' in df.columns else 0
-        average_profit = df['profit'].mean() if 'profit' in df.columns and len(df) > 0 else 0
-        max_profit = df['profit'].max() if 'profit' in df.columns and len(df) > 0 else 0
-        max_loss = df['profit'].min() if 'profit' in df.columns and len(df) > 0 else 0
-        
-        # Strategy performance
-        strategy_performance = {}
-        if 'strategy' in df.columns:
-            for strategy in df['strategy'].unique():
-                strategy_df = df[df['strategy'] == strategy]
-                strategy_profit = strategy_df['profit'].sum() if 'profit' in strategy_df.columns else 0
-                strategy_count = len(strategy_df)
-                strategy_performance[strategy] = {
-                    'total_trades': strategy_count,
-                    'total_profit': strategy_profit,
-                    'avg_profit': strategy_profit / strategy_count if strategy_count > 0 else 0
-                }
-        
-        # Symbol performance
-        symbol_performance = {}
-        for symbol in df['symbol'].unique():
-            symbol_df = df[df['symbol'] == symbol]
-            symbol_profit = symbol_df['profit'].sum() if 'profit' in symbol_df.columns else 0
-            symbol_count = len(symbol_df)
-            symbol_performance[symbol] = {
-                'total_trades': symbol_count,
-                'total_profit': symbol_profit,
-                'avg_profit': symbol_profit / symbol_count if symbol_count > 0 else 0
-            }
-        
-        # Format the summary
-        summary = f"""
+        total_trades = 0
+        winning_trades = 0
+        profit_sum = 0.0
+        profit_count = 0
+        max_profit = None
+        max_loss = None
+        first_trade = None
+        last_trade = None
+        strategy_partials = []
+        symbol_partials = []
+        
+        # Stream the trade log, one record per line
+        with pd.read_json(TRADE_LOG_FILE, lines=True, chunksize=TRADE_LOG_CHUNKSIZE) as reader:
+            for df in reader:
+                if df.empty:
+                    continue
+                
+                total_trades += len(df)
+                
+                # Track the period covered
+                timestamps = pd.to_datetime(df['timestamp'])
+                first_trade = timestamps.min() if first_trade is None else min(first_trade, timestamps.min())
+                last_trade = timestamps.max() if last_trade is None else max(last_trade, timestamps.max())
+                
+                # P&L stats
+                if 'profit' in df.columns:
+                    profit = df['profit']
+                    winning_trades += (profit > 0).sum()
+                    profit_sum += profit.sum()
+                    profit_count += profit.count()
+                    if profit.count():
+                        max_profit = profit.max() if max_profit is None else max(max_profit, profit.max())
+                        max_loss = profit.min() if max_loss is None else min(max_loss, profit.min())
+                
+                # Strategy and symbol performance
+                if 'strategy' in df.columns:
+                    strategy_partials.append(group_totals(df, 'strategy'))
+                symbol_partials.append(group_totals(df, 'symbol'))
+        
+        if total_trades == 0:
+            return "No trades recorded yet."
+        
+        win_rate = winning_trades / total_trades
+        total_profit = profit_sum
+        average_profit = profit_sum / profit_count if profit_count else 0
+        max_profit = max_profit if max_profit is not None else 0
+        max_loss = max_loss if max_loss is not None else 0
+        
+        strategy_performance = summarize_groups(strategy_partials)
+        symbol_performance = summarize_groups(symbol_partials)
+        
+        # Format the summary as parts joined once at the end
+        parts = [f"""
         TRADING BOT PERFORMANCE SUMMARY
         ==============================
-        Period: {df['timestamp'].min().strftime('%Y-%m-%d')} to {df['timestamp'].max().strftime('%Y-%m-%d')}
+        Period: {first_trade.strftime('%Y-%m-%d')} to {last_trade.strftime('%Y-%m-%d')}
         Total Trades: {total_trades}
         Win Rate: {win_rate:.2%}
         
@@ -128,24 +161,36 @@ def generate_stats_summary():
         
         STRATEGY PERFORMANCE
         -------------------
-        """
+        """]
         
         for strategy, stats in strategy_performance.items():
-            summary += f"{strategy}: {stats['total_trades']} trades, ${stats['total_profit']:.2f} total P&L, ${stats['avg_profit']:.2f} avg\n        "
+            parts.append(f"{strategy}: {stats['total_trades']} trades, ${stats['total_profit']:.2f} total P&L, ${stats['avg_profit']:.2f} avg\n        ")
         
-        summary += """
+        parts.append("""
         SYMBOL PERFORMANCE
         -----------------
-        """
+        """)
         
         for symbol, stats in symbol_performance.items():
-            summary += f"{symbol}: {stats['total_trades']} trades, ${stats['total_profit']:.2f} total P&L, ${stats['avg_profit']:.2f} avg\n        "
+            parts.append(f"{symbol}: {stats['total_trades']} trades, ${stats['total_profit']:.2f} total P&L, ${stats['avg_profit']:.2f} avg\n        ")
         
-        return summary
+        return ''.join(parts)
         
     except Exception as e:
         return f"Error generating stats summary: {e}"
 
+def install_event_loop():
+    """Use uvloop for the asyncio loop driving ib_insync when it's available."""
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    
+    if sys.platform != 'win32':
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        return True
+    return False
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description='Eco ETF Trading Bot')
@@ -199,6 +244,9 @@ def main():
     if args.backtest:
         logger.info("Starting backtest mode")
         
+        from config.symbols import ETF_LIST
+        from tests.backtest import run_all_backtests
+        
         # Get symbols for backtesting
         symbols = args.symbols if args.symbols else [etf.symbol for etf in ETF_LIST]
         
@@ -222,6 +270,26 @@ def main():
     trading_mode = "Paper Trading" if args.paper else "Live Trading"
     logger.info(f"Trading Mode: {trading_mode}")
     
+    # Must happen before ib_insync creates its event loop
+    if install_event_loop():
+        logger.info("Using uvloop event loop")
+    
+    from core.connection import IBConnection
+    from core.bot import EcoETFBot
+    from core.portfolio import Portfolio
+    from data.historical import HistoricalDataProvider
+    from data.market_data import MarketDataProvider
+    from strategies.moving_average import MovingAverageCrossover
+    from strategies.enhanced_ma import EnhancedMovingAverage
+    from strategies.volatility import VolatilityBreakout
+    from strategies.mean_reversion import MeanReversionStrategy
+    from strategies.ensemble import EnsembleStrategy
+    from execution.order import OrderExecutor
+    from execution.position import PositionManager
+    from utils.market_hours import MarketHoursChecker
+    from utils.risk_management import RiskManager
+    from utils.advanced_risk_management import AdvancedRiskManager
+    
     try:
         # Initialize components
         logger.info("Initializing components...")
@@ -250,7 +318,8 @@ def main():
             logger.info("Using Basic Risk Management")
         
         # Create order executor
-        order_executor = OrderExecutor(connection, market_hours_checker, is_paper=args.paper)
+        order_executor = OrderExecutor(connection, market_hours_checker, market_data,
+                                       is_paper=args.paper)
         
         # Create position manager
         position_manager = PositionManager(connection, order_executor)
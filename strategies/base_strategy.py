@@ -1,22 +1,100 @@
 """Base strategy class for the trading bot."""
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import SIGNAL_WORKERS, HISTORY_FETCH_WORKERS
 
 logger = logging.getLogger('strategies.base')
 
 class BaseStrategy:
     """Base class for all trading strategies."""
     
+    # Optional backtest fast path: generate_signals_batch(prices) -> (actions, volatility)
+    # (days, symbols) arrays; strategies whose signals depend only on past prices set it
+    generate_signals_batch = None
+    
     def __init__(self, data_provider):
         """Initialize the strategy with a data provider."""
         self.data_provider = data_provider
+        self._pools = {}  # Name -> ThreadPoolExecutor, created on first use and reused
+    
+    def __getstate__(self):
+        # Executors can't be pickled; the copy creates its own on first use
+        state = self.__dict__.copy()
+        state['_pools'] = {}
+        return state
+    
+    def _pool(self, name, workers):
+        """Get this strategy's thread pool for name, creating it on first use."""
+        pool = self._pools.get(name)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{type(self).__name__}-{name}')
+            self._pools[name] = pool
+        return pool
+    
+    def close(self):
+        """Shut down the strategy's thread pools."""
+        for pool in self._pools.values():
+            pool.shutdown()
+        self._pools = {}
+    
+    def history_duration(self):
+        """Get the IB duration string of history this strategy needs.
+        
+        Subclasses that need more than the data provider's default should
+        override this.
+        """
+        return '20 D'
+    
+    def fetch_history(self, contracts, duration):
+        """Fetch historical data for all contracts in one batch.
+        
+        Uses the data provider's concurrent get_batch when it has one.
+        Otherwise each contract is fetched with get_historical_data on the
+        strategy's fetch pool, so slow fetches overlap instead of adding up.
+        
+        Args:
+            contracts: List of IB contract objects
+            duration: IB duration string, e.g. '100 D'
+            
+        Returns:
+            dict: DataFrame (or None) by symbol
+        """
+        if hasattr(self.data_provider, 'get_batch'):
+            frames = self.data_provider.get_batch(contracts, duration=duration)
+        else:
+            frames = list(self._pool('fetch', HISTORY_FETCH_WORKERS).map(
+                lambda contract: self.data_provider.get_historical_data(contract, duration=duration),
+                contracts
+            ))
+        return {contract.symbol: df for contract, df in zip(contracts, frames)}
+        
+    def map_contracts(self, process, contracts, history):
+        """Evaluate process(contract, df) for every contract on the signal pool.
+        
+        History must already be fetched; only the per-contract computation
+        runs in parallel, which numpy and pandas mostly do without the GIL.
+        
+        Args:
+            process: Callable returning a signal dict or None
+            contracts: List of IB contract objects
+            history: DataFrame (or None) by symbol
+            
+        Returns:
+            dict: Signals by symbol, in contract order
+        """
+        results = self._pool('signal', SIGNAL_WORKERS).map(
+            lambda contract: process(contract, history[contract.symbol]), contracts)
+        return {contract.symbol: signal for contract, signal in zip(contracts, results) if signal}
         
-    def generate_signals(self, contracts):
+    def generate_signals(self, contracts, history=None):
         """Generate trading signals for the given contracts.
         
         This method should be implemented by subclasses.
         
         Args:
             contracts: List of IB contract objects to analyze
+            history: Optional prefetched DataFrames by symbol, covering at
+                least history_duration()
             
         Returns:
             dict: A dictionary of signals by symbol
@@ -1,9 +1,13 @@
 """Ensemble strategy that combines multiple strategies."""
 import logging
+import numpy as np
 from strategies.base_strategy import BaseStrategy
 
 logger = logging.getLogger('strategies.ensemble')
 
+# Stand-in for strategies that didn't signal a symbol
+_NO_VOTE = {'action': ''}
+
 class EnsembleStrategy(BaseStrategy):
     """Combines signals from multiple strategies with weighted voting."""
     
@@ -26,61 +30,75 @@ class EnsembleStrategy(BaseStrategy):
             total = sum(weights)
             self.weights = [w / total for w in weights]
     
-    def generate_signals(self, contracts):
+    def close(self):
+        """Shut down this strategy's and every sub-strategy's thread pools."""
+        for strategy in self.strategies:
+            strategy.close()
+        super().close()
+    
+    def history_duration(self):
+        """Get the longest history any of the strategies needs."""
+        return max((strategy.history_duration() for strategy in self.strategies),
+                   key=lambda duration: int(duration.split()[0]))
+    
+    def generate_signals(self, contracts, history=None):
         """Generate signals by combining results from all strategies."""
-        all_signals = {}
+        # Fetch history once and share it instead of once per strategy
+        if history is None:
+            history = self.fetch_history(contracts, duration=self.history_duration())
         
         # Collect signals from each strategy
-        for i, strategy in enumerate(self.strategies):
-            strategy_signals = strategy.generate_signals(contracts)
-            weight = self.weights[i]
-            
-            # Store signals with strategy weight
-            for symbol, signal_data in strategy_signals.items():
-                if symbol not in all_signals:
-                    all_signals[symbol] = {
-                        'buy_score': 0.0,
-                        'sell_score': 0.0,
-                        'price': signal_data['price'],
-                        'volatility': signal_data.get('volatility', 0.2),
-                        'strategies': []
-                    }
-                
-                # Add this strategy's vote
-                if signal_data['action'] == 'BUY':
-                    all_signals[symbol]['buy_score'] += weight
-                elif signal_data['action'] == 'SELL':
-                    all_signals[symbol]['sell_score'] += weight
-                
-                # Track which strategies generated signals
-                all_signals[symbol]['strategies'].append({
-                    'name': strategy.__class__.__name__,
-                    'action': signal_data['action'],
-                    'weight': weight
-                })
+        strategy_signals = []
+        for strategy in self.strategies:
+            # Shallow copies let each strategy add its own indicator columns
+            # without clobbering another's (several reuse names like 'sma')
+            shared = {symbol: df.copy(deep=False) if df is not None else None
+                      for symbol, df in history.items()}
+            strategy_signals.append(strategy.generate_signals(contracts, history=shared))
+        
+        # Index every symbol any strategy signaled, in first-seen order,
+        # keeping the first signal for its price and volatility
+        first_signals = {}
+        for signals in strategy_signals:
+            for symbol, signal_data in signals.items():
+                first_signals.setdefault(symbol, signal_data)
+        symbols = list(first_signals)
+        if not symbols:
+            return {}
+        
+        # Accumulate weighted votes as arrays over symbols
+        buy_score = np.zeros(len(symbols))
+        sell_score = np.zeros(len(symbols))
+        for weight, signals in zip(self.weights, strategy_signals):
+            actions = np.array([signals.get(symbol, _NO_VOTE)['action'] for symbol in symbols])
+            buy_score += weight * (actions == 'BUY')
+            sell_score += weight * (actions == 'SELL')
         
         # Determine final signals based on consensus
+        threshold = 0.6  # Require 60% consensus for a signal
+        buy_mask = (buy_score > threshold) & (buy_score > sell_score)
+        sell_mask = (sell_score > threshold) & (sell_score > buy_score)
+        
         signals = {}
-        for symbol, data in all_signals.items():
-            action = None
-            threshold = 0.6  # Require 60% consensus for a signal
+        for i in np.flatnonzero(buy_mask | sell_mask):
+            symbol = symbols[i]
+            action = 'BUY' if buy_mask[i] else 'SELL'
+            confidence = buy_score[i] if buy_mask[i] else sell_score[i]
             
-            if data['buy_score'] > threshold and data['buy_score'] > data['sell_score']:
-                action = 'BUY'
-            elif data['sell_score'] > threshold and data['sell_score'] > data['buy_score']:
-                action = 'SELL'
+            first_signal = first_signals[symbol]
+            contributing = [strategy.__class__.__name__
+                            for strategy, s in zip(self.strategies, strategy_signals)
+                            if s.get(symbol, _NO_VOTE)['action'] == action]
             
-            if action:
-                signals[symbol] = {
-                    'action': action,
-                    'price': data['price'],
-                    'volatility': data['volatility'],
-                    'confidence': data['buy_score'] if action == 'BUY' else data['sell_score'],
-                    'contributing_strategies': ', '.join([s['name'] for s in data['strategies'] 
-                                                        if s['action'] == action])
-                }
-                
-                logger.info(f"Ensemble generated {action} signal for {symbol} with " 
-                           f"confidence {signals[symbol]['confidence']:.2f}")
+            signals[symbol] = {
+                'action': action,
+                'price': first_signal['price'],
+                'volatility': first_signal.get('volatility', 0.2),
+                'confidence': confidence,
+                'contributing_strategies': ', '.join(contributing)
+            }
+            
+            logger.info("Ensemble generated %s signal for %s with confidence %.2f",
+                        action, symbol, signals[symbol]['confidence'])
                 
         return signals
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Technical indicators shared by the trading strategies."""
+import numpy as np
+import pandas as pd
+
+def sma(prices, period, offset=0):
+    """Calculate the simple moving average ending offset bars before the last.
+    
+    Args:
+        prices: Array of closing prices
+        period: Number of bars to average
+        offset: Bars back from the last one the window ends at
+        
+    Returns:
+        float: Mean of the window
+    """
+    end = len(prices) - offset
+    return np.asarray(prices[end-period:end], dtype=float).mean()
+
+def bollinger(prices, period=20, nstd=2.0):
+    """Calculate Bollinger bands for the last bar.
+    
+    Args:
+        prices: Array of closing prices
+        period: Number of bars in the band window
+        nstd: Band width in standard deviations
+        
+    Returns:
+        tuple: (sma, upper_band, lower_band)
+    """
+    window = np.asarray(prices[-period:], dtype=float)
+    mean = window.mean()
+    std = window.std(ddof=1)
+    return mean, mean + (std * nstd), mean - (std * nstd)
+
+def _wilder_smoothing(prices, period):
+    """Run Wilder's smoothing over prices.
+    
+    Returns:
+        tuple: (rsi, avg_up, avg_down), where the averages line up with
+        rsi[period:]
+    """
+    prices = np.asarray(prices, dtype=float)
+    deltas = np.diff(prices)
+    seed = deltas[:period+1]
+    up = np.maximum(seed, 0.).sum()/period
+    down = -np.minimum(seed, 0.).sum()/period
+    rs = up/down if down != 0 else np.inf
+    rsi = np.zeros_like(prices)
+    rsi[:period] = 100. - 100./(1. + rs)
+    avg_up = avg_down = np.empty(0)
+    
+    if len(prices) > period:
+        # Split moves into gains and losses without per-element branching
+        moves = deltas[period-1:]
+        ups = pd.Series(np.concatenate(([up], np.maximum(moves, 0.))))
+        downs = pd.Series(np.concatenate(([down], -np.minimum(moves, 0.))))
+        
+        # Wilder's smoothing: avg = (avg * (period-1) + value) / period
+        avg_up = ups.ewm(alpha=1/period, adjust=False).mean().values[1:]
+        avg_down = downs.ewm(alpha=1/period, adjust=False).mean().values[1:]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = np.where(avg_down != 0, avg_up / avg_down, np.inf)
+        rsi[period:] = 100. - 100./(1. + rs)
+    
+    return rsi, avg_up, avg_down
+
+def rsi(prices, period=14):
+    """Calculate RSI using Wilder's smoothing.
+    
+    The smoothing recurrence runs as an exponentially weighted mean with
+    alpha=1/period, seeded with the average of the first moves.
+    
+    Args:
+        prices: Array of closing prices
+        period: RSI lookback period
+        
+    Returns:
+        np.ndarray: RSI values aligned with prices
+    """
+    return _wilder_smoothing(prices, period)[0]
+
+class RSICache:
+    """Keeps Wilder RSI state per symbol so each cycle only processes new bars."""
+    
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._state = {}  # (symbol, period) -> smoothing state at the last bar
+    
+    def calculate(self, symbol, prices, dates, period=14):
+        """Calculate RSI, extending the cached smoothing where possible.
+        
+        Bars already seen in the previous call reuse their cached RSI, and
+        each newer bar costs one step of the smoothing recurrence. The last
+        cached bar is always recomputed since its close can still move
+        while the bar is open. Wilder's smoothing depends on where the series
+        starts, so a window whose first bar changed (e.g. a sliding IB
+        duration) is recomputed in full to match rsi() exactly.
+        
+        Args:
+            symbol: Symbol the prices belong to
+            prices: Array of closing prices
+            dates: Array of bar timestamps aligned with prices, or None
+            period: RSI lookback period
+            
+        Returns:
+            np.ndarray: RSI values aligned with prices
+        """
+        prices = np.asarray(prices, dtype=float)
+        n = len(prices)
+        if dates is None or n < period + 2:
+            return rsi(prices, period)
+        
+        dates = np.asarray(dates)
+        key = (symbol, period)
+        state = self._state.get(key)
+        
+        start = None
+        if state is not None and dates[0] == state['first_date']:
+            matches = np.flatnonzero(dates == state['last_date'])
+            if len(matches):
+                start = matches[-1]
+                offset = len(state['rsi']) - 1 - start
+                # Fall back to a full pass unless the cache covers every earlier bar
+                if start < period + 1 or offset < 0:
+                    start = None
+        
+        if start is None:
+            values, avg_up, avg_down = _wilder_smoothing(prices, period)
+            up, down = avg_up[-2], avg_down[-2]
+        else:
+            values = np.empty(n)
+            values[:start] = state['rsi'][offset:offset+start]
+            up, down = state['up'], state['down']
+            for i in range(start, n):
+                if i == n - 1:
+                    # Keep the averages before the newest bar for the next call
+                    prev_up, prev_down = up, down
+                delta = prices[i] - prices[i-1]
+                up = (up * (period-1) + max(delta, 0.)) / period
+                down = (down * (period-1) + max(-delta, 0.)) / period
+                rs = up/down if down != 0 else np.inf
+                values[i] = 100. - 100./(1. + rs)
+            up, down = prev_up, prev_down
+        
+        self._state[key] = {'first_date': dates[0], 'last_date': dates[-1],
+                            'rsi': values, 'up': up, 'down': down}
+        return values
\ No newline at end of file
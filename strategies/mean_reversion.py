@@ -1,7 +1,9 @@
 """Mean reversion strategy for range-bound markets."""
 import logging
+from datetime import date
 import numpy as np
 from strategies.base_strategy import BaseStrategy
+from strategies import indicators
 
 logger = logging.getLogger('strategies.mean_reversion')
 
@@ -9,7 +11,8 @@ class MeanReversionStrategy(BaseStrategy):
     """Mean reversion strategy for range-bound ETFs."""
     
     def __init__(self, data_provider, rsi_period=14, rsi_oversold=30, rsi_overbought=70,
-                 bollinger_period=20, bollinger_std=2.0, min_mean_reversion_score=0.7):
+                 bollinger_period=20, bollinger_std=2.0, min_mean_reversion_score=0.7,
+                 score_refresh_days=7):
         """Initialize the mean reversion strategy."""
         super().__init__(data_provider)
         self.rsi_period = rsi_period
@@ -18,103 +21,138 @@ class MeanReversionStrategy(BaseStrategy):
         self.bollinger_period = bollinger_period
         self.bollinger_std = bollinger_std
         self.min_mean_reversion_score = min_mean_reversion_score
+        self._rsi_cache = indicators.RSICache()
+        
+        # Mean reversion scores drift slowly, so reuse them for a while
+        self.score_refresh_days = score_refresh_days
+        self._mr_score_cache = {}  # Symbol -> (score, date of the last bar it was computed on)
     
     def calculate_rsi(self, prices, period=14):
         """Calculate RSI technical indicator."""
-        deltas = np.diff(prices)
-        seed = deltas[:period+1]
-        up = seed[seed >= 0].sum()/period
-        down = -seed[seed < 0].sum()/period
-        rs = up/down if down != 0 else np.inf
-        rsi = np.zeros_like(prices)
-        rsi[:period] = 100. - 100./(1. + rs)
-        
-        for i in range(period, len(prices)):
-            delta = deltas[i-1]
-            if delta > 0:
-                upval = delta
-                downval = 0
-            else:
-                upval = 0
-                downval = -delta
-                
-            up = (up * (period-1) + upval) / period
-            down = (down * (period-1) + downval) / period
-            rs = up/down if down != 0 else np.inf
-            rsi[i] = 100. - 100./(1. + rs)
-        return rsi
+        return indicators.rsi(prices, period)
     
-    def calculate_mean_reversion_score(self, df, lookback=100):
-        """Calculate a score indicating how mean-reverting an asset is."""
+    def calculate_mean_reversion_score(self, df, lookback=100, returns=None):
+        """Calculate a score indicating how mean-reverting an asset is.
+        
+        Pass the array of returns when it's already computed to skip the
+        recompute.
+        """
         if len(df) < lookback:
             return 0.5  # Not enough data
             
         # Calculate returns
-        returns = df['close'].pct_change().dropna()
+        if returns is None:
+            closes = df['close'].to_numpy(dtype=np.float64)
+            returns = np.diff(closes) / closes[:-1]
         
-        # Calculate autocorrelation of returns
+        # Calculate lag-1 autocorrelation of returns
         # Negative autocorrelation suggests mean reversion
-        autocorr = returns[-lookback:].autocorr(1)
+        window = returns[-lookback:]
+        autocorr = np.corrcoef(window[:-1], window[1:])[0, 1]
         
         # Normalize to a 0-1 score where higher means more mean-reverting
         score = 0.5 - min(max(autocorr, -1), 1) / 2
         
         return score
     
-    def generate_signals(self, contracts):
-        """Generate mean reversion trading signals."""
-        signals = {}
+    @staticmethod
+    def bar_date(df):
+        """Get the date of the last bar in df, or today if df has no dates."""
+        if df is None or 'date' not in df.columns or len(df) == 0:
+            return date.today()
+        last = df['date'].iat[-1]
+        return last.date() if hasattr(last, 'date') else last
+    
+    def cached_score(self, symbol, as_of=None):
+        """Get the cached mean reversion score for symbol, or None if stale.
         
+        Args:
+            symbol: Symbol to look up
+            as_of: Date of the bar being evaluated; defaults to today
+        """
+        cached = self._mr_score_cache.get(symbol)
+        if cached is None:
+            return None
+        score, computed = cached
+        days = ((as_of or date.today()) - computed).days
+        if not 0 <= days <= self.score_refresh_days:
+            return None
+        return score
+    
+    def history_duration(self):
+        """Get the IB duration string of history this strategy needs."""
+        return '100 D'
+    
+    def generate_signals(self, contracts, history=None):
+        """Generate mean reversion trading signals."""
+        # Skip contracts whose recent score already rules them out
+        candidates = []
         for contract in contracts:
-            # Get historical data
-            df = self.data_provider.get_historical_data(
-                contract,
-                duration='100 D'
-            )
-            
-            if df is None or len(df) < self.bollinger_period + 2:
-                logger.warning(f"Insufficient data for {contract.symbol}")
-                continue
-                
-            # Calculate mean reversion score
-            mr_score = self.calculate_mean_reversion_score(df)
-            
-            # If asset doesn't exhibit mean reversion, skip it
-            if mr_score < self.min_mean_reversion_score:
-                logger.info(f"Skipping {contract.symbol} - low mean reversion score: {mr_score:.2f}")
+            as_of = self.bar_date(history.get(contract.symbol)) if history is not None else None
+            score = self.cached_score(contract.symbol, as_of)
+            if score is not None and score < self.min_mean_reversion_score:
+                logger.debug("Skipping %s - cached mean reversion score: %.2f", contract.symbol, score)
                 continue
-                
-            # Calculate indicators
-            df['sma'] = df['close'].rolling(self.bollinger_period).mean()
-            df['std'] = df['close'].rolling(self.bollinger_period).std()
-            df['upper_band'] = df['sma'] + (df['std'] * self.bollinger_std)
-            df['lower_band'] = df['sma'] - (df['std'] * self.bollinger_std)
-            df['pct_b'] = (df['close'] - df['lower_band']) / (df['upper_band'] - df['lower_band'])
-            
-            # Calculate RSI
-            df['rsi'] = self.calculate_rsi(df['close'].values, self.rsi_period)
-            
-            # Get the last row
-            last_row = df.iloc[-1]
+            candidates.append(contract)
+        
+        if not candidates:
+            return {}
+        
+        # Get historical data for every remaining contract in one batch
+        if history is None:
+            history = self.fetch_history(candidates, duration=self.history_duration())
+        
+        # Contracts are independent, so evaluate them in parallel
+        return self.map_contracts(self._process_contract, candidates, history)
+    
+    def _process_contract(self, contract, df):
+        """Generate the mean reversion signal for one contract, if any."""
+        if df is None or len(df) < self.bollinger_period + 2:
+            logger.warning("Insufficient data for %s", contract.symbol)
+            return None
             
-            # Determine signal
-            signal = None
+        # Work on the raw close array; returns are shared by the score and
+        # the volatility estimate
+        closes = df['close'].to_numpy(dtype=np.float64)
+        returns = np.diff(closes) / closes[:-1]
+        
+        # Calculate mean reversion score unless a recent one is cached
+        as_of = self.bar_date(df)
+        mr_score = self.cached_score(contract.symbol, as_of)
+        if mr_score is None:
+            mr_score = self.calculate_mean_reversion_score(df, returns=returns)
+            self._mr_score_cache[contract.symbol] = (mr_score, as_of)
+        
+        # If asset doesn't exhibit mean reversion, skip it
+        if mr_score < self.min_mean_reversion_score:
+            logger.info("Skipping %s - low mean reversion score: %.2f", contract.symbol, mr_score)
+            return None
             
-            # Buy signal: Price near lower band and RSI oversold
-            if (last_row['pct_b'] < 0.2 and last_row['rsi'] < self.rsi_oversold):
-                signal = 'BUY'
-                
-            # Sell signal: Price near upper band and RSI overbought
-            elif (last_row['pct_b'] > 0.8 and last_row['rsi'] > self.rsi_overbought):
-                signal = 'SELL'
+        # Only the last bar is used, so compute its Bollinger bands directly
+        sma, upper_band, lower_band = indicators.bollinger(closes, self.bollinger_period, self.bollinger_std)
+        last_close = closes[-1]
+        pct_b = (last_close - lower_band) / (upper_band - lower_band)
+        
+        # Calculate RSI, only stepping through bars newer than the last cycle
+        dates = df['date'].values if 'date' in df.columns else None
+        rsi = self._rsi_cache.calculate(contract.symbol, closes, dates, self.rsi_period)[-1]
+        
+        # Determine signal
+        signal = None
+        
+        # Buy signal: Price near lower band and RSI oversold
+        if (pct_b < 0.2 and rsi < self.rsi_oversold):
+            signal = 'BUY'
             
-            if signal:
-                logger.info(f"Generated {signal} signal for {contract.symbol} (MR Score: {mr_score:.2f})")
-                signals[contract.symbol] = {
-                    'action': signal,
-                    'price': last_row['close'],
-                    'volatility': df['close'].pct_change().std() * np.sqrt(252),
-                    'mean_reversion_score': mr_score
-                }
-                
-        return signals
\ No newline at end of file
+        # Sell signal: Price near upper band and RSI overbought
+        elif (pct_b > 0.8 and rsi > self.rsi_overbought):
+            signal = 'SELL'
+        
+        if signal:
+            logger.info("Generated %s signal for %s (MR Score: %.2f)", signal, contract.symbol, mr_score)
+            return {
+                'action': signal,
+                'price': last_close,
+                'volatility': returns[-252:].std(ddof=1) * np.sqrt(252),
+                'mean_reversion_score': mr_score
+            }
\ No newline at end of file
@@ -2,10 +2,54 @@
 import logging
 import numpy as np
 from strategies.base_strategy import BaseStrategy
+from strategies import indicators
+from utils.jit import jit
 from config.settings import SMA_SHORT, SMA_LONG, LOOKBACK_PERIOD
 
 logger = logging.getLogger('strategies.enhanced_ma')
 
+def make_crossover_kernel(short_period, long_period, volume_window=20):
+    """Build a kernel for the last two bars with the periods fixed as constants.
+    
+    The kernel takes close and volume arrays and returns
+    (sma_short, sma_long, prev_sma_short, prev_sma_long, volume_ratio).
+    
+    Args:
+        short_period: Short moving average period
+        long_period: Long moving average period
+        volume_window: Bars in the average volume
+        
+    Returns:
+        function: Kernel, compiled when Numba is available
+    """
+    def kernel(close, volume):
+        n = len(close)
+        
+        short_sum = 0.0
+        for i in range(n - short_period, n):
+            short_sum += close[i]
+        long_sum = 0.0
+        for i in range(n - long_period, n):
+            long_sum += close[i]
+        
+        # Slide each window back one bar for the previous values
+        prev_short_sum = short_sum - close[n-1] + close[n-1-short_period]
+        prev_long_sum = long_sum - close[n-1] + close[n-1-long_period]
+        
+        volume_ratio = np.nan
+        if n >= volume_window:
+            volume_sum = 0.0
+            for i in range(n - volume_window, n):
+                volume_sum += volume[i]
+            volume_avg = volume_sum / volume_window
+            volume_ratio = volume[n-1] / volume_avg if volume_avg != 0 else np.nan
+        
+        return (short_sum / short_period, long_sum / long_period,
+                prev_short_sum / short_period, prev_long_sum / long_period,
+                volume_ratio)
+    
+    return jit(kernel)
+
 class EnhancedMovingAverage(BaseStrategy):
     """Enhanced moving average strategy with multiple confirmations."""
     
@@ -18,31 +62,24 @@ class EnhancedMovingAverage(BaseStrategy):
         self.volume_factor = volume_factor  # Volume should be this times average to confirm
         self.signal_strength_threshold = signal_strength_threshold  # Min % difference for crossover
         self.rsi_period = rsi_period
+        self._rsi_cache = indicators.RSICache()
+        
+        # Periods never change after construction, so bake them into the kernel
+        self._crossover_kernel = make_crossover_kernel(short_period, long_period)
+    
+    def __getstate__(self):
+        # The kernel is a local closure, so rebuild it instead of pickling it
+        state = super().__getstate__()
+        del state['_crossover_kernel']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._crossover_kernel = make_crossover_kernel(self.short_period, self.long_period)
     
     def calculate_rsi(self, prices, period=14):
         """Calculate RSI technical indicator."""
-        deltas = np.diff(prices)
-        seed = deltas[:period+1]
-        up = seed[seed >= 0].sum()/period
-        down = -seed[seed < 0].sum()/period
-        rs = up/down if down != 0 else np.inf
-        rsi = np.zeros_like(prices)
-        rsi[:period] = 100. - 100./(1. + rs)
-        
-        for i in range(period, len(prices)):
-            delta = deltas[i-1]
-            if delta > 0:
-                upval = delta
-                downval = 0
-            else:
-                upval = 0
-                downval = -delta
-                
-            up = (up * (period-1) + upval) / period
-            down = (down * (period-1) + downval) / period
-            rs = up/down if down != 0 else np.inf
-            rsi[i] = 100. - 100./(1. + rs)
-        return rsi
+        return indicators.rsi(prices, period)
     
     def detect_market_regime(self, df, lookback=50):
         """Detect if market is trending or range-bound."""
@@ -50,7 +87,7 @@ class EnhancedMovingAverage(BaseStrategy):
             return "unknown"
             
         # Calculate directional movement
-        price_direction = df['close'].iloc[-1] - df['close'].iloc[-lookback]
+        price_direction = df['close'].iat[-1] - df['close'].iat[-lookback]
         price_range = df['high'].iloc[-lookback:].max() - df['low'].iloc[-lookback:].min()
         
         # Calculate ADX-like measure
@@ -61,75 +98,76 @@ class EnhancedMovingAverage(BaseStrategy):
         else:
             return "range_bound"
     
-    def generate_signals(self, contracts):
+    def history_duration(self):
+        """Get the IB duration string of history this strategy needs."""
+        # More data points than the lookback to calculate indicators
+        return f'{max(LOOKBACK_PERIOD, 50) + 20} D'
+    
+    def generate_signals(self, contracts, history=None):
         """Generate trading signals with confirmation filters."""
-        signals = {}
-        
-        for contract in contracts:
-            # Get historical data with more data points to calculate indicators
-            df = self.data_provider.get_historical_data(
-                contract,
-                duration=f'{max(LOOKBACK_PERIOD, 50) + 20} D'
-            )
-            
-            if df is None or len(df) < self.long_period + 2:
-                logger.warning(f"Insufficient data for {contract.symbol}")
-                continue
-                
-            # Calculate indicators
-            df['sma_short'] = df['close'].rolling(self.short_period).mean()
-            df['sma_long'] = df['close'].rolling(self.long_period).mean()
-            df['ma_diff'] = (df['sma_short'] - df['sma_long']) / df['close'] * 100  # % difference
-            df['volume_avg'] = df['volume'].rolling(20).mean()
-            df['volume_ratio'] = df['volume'] / df['volume_avg']
-            
-            # Calculate RSI
-            df['rsi'] = self.calculate_rsi(df['close'].values, self.rsi_period)
-            
-            # Detect market regime
-            market_regime = self.detect_market_regime(df)
-            
-            # Get last two rows to check for crossover
-            last_row = df.iloc[-1]
-            prev_row = df.iloc[-2]
-            
-            # Determine base signal
-            signal = None
+        # Get historical data with more data points to calculate indicators
+        if history is None:
+            history = self.fetch_history(contracts, duration=self.history_duration())
+        
+        # Contracts are independent, so evaluate them in parallel
+        return self.map_contracts(self._process_contract, contracts, history)
+    
+    def _process_contract(self, contract, df):
+        """Generate the confirmed crossover signal for one contract, if any."""
+        if df is None or len(df) < self.long_period + 2:
+            logger.warning("Insufficient data for %s", contract.symbol)
+            return None
             
-            # Buy signal: short MA crosses above long MA
-            if (prev_row['sma_short'] <= prev_row['sma_long'] and 
-                last_row['sma_short'] > last_row['sma_long']):
-                
-                # Apply confirmation filters
-                if (abs(last_row['ma_diff']) >= self.signal_strength_threshold and
-                    last_row['volume_ratio'] >= self.volume_factor):
-                    
-                    # Additional RSI filter
-                    if market_regime == "trending" or (
-                        market_regime == "range_bound" and last_row['rsi'] < 70):
-                        signal = 'BUY'
-                        
-            # Sell signal: short MA crosses below long MA
-            elif (prev_row['sma_short'] >= prev_row['sma_long'] and 
-                  last_row['sma_short'] < last_row['sma_long']):
-                
-                # Apply confirmation filters
-                if (abs(last_row['ma_diff']) >= self.signal_strength_threshold and
-                    last_row['volume_ratio'] >= self.volume_factor):
-                    
-                    # Additional RSI filter
-                    if market_regime == "trending" or (
-                        market_regime == "range_bound" and last_row['rsi'] > 30):
-                        signal = 'SELL'
+        # Only the last two bars are used, so compute their indicators directly
+        closes = df['close'].values
+        volumes = df['volume'].values
+        (sma_short, sma_long, prev_sma_short, prev_sma_long,
+         volume_ratio) = self._crossover_kernel(closes, volumes)
+        last_close = closes[-1]
+        ma_diff = (sma_short - sma_long) / last_close * 100  # % difference
+        
+        # Calculate RSI, only stepping through bars newer than the last cycle
+        dates = df['date'].values if 'date' in df.columns else None
+        rsi = self._rsi_cache.calculate(contract.symbol, closes, dates, self.rsi_period)[-1]
+        
+        # Detect market regime
+        market_regime = self.detect_market_regime(df)
+        
+        # Crossovers from the sign of the MA spread on the last two bars
+        spread_sign = np.sign(sma_short - sma_long)
+        prev_spread_sign = np.sign(prev_sma_short - prev_sma_long)
+        cross_up = (spread_sign > 0) & (prev_spread_sign <= 0)
+        cross_down = (spread_sign < 0) & (prev_spread_sign >= 0)
+        
+        # Confirmation filters
+        confirmed = ((abs(ma_diff) >= self.signal_strength_threshold) &
+                     (volume_ratio >= self.volume_factor))
+        trending = market_regime == "trending"
+        range_bound = market_regime == "range_bound"
+        
+        # Determine signal, with an additional RSI filter in range-bound markets
+        signal = None
+        
+        # Buy signal: short MA crosses above long MA
+        if cross_up & confirmed & (trending | (range_bound & (rsi < 70))):
+            signal = 'BUY'
+        
+        # Sell signal: short MA crosses below long MA
+        elif cross_down & confirmed & (trending | (range_bound & (rsi > 30))):
+            signal = 'SELL'
+        
+        if signal:
+            # Only fall back to computing volatility when the frame doesn't carry it
+            if 'volatility' in df.columns:
+                volatility = df['volatility'].iat[-1]
+            else:
+                volatility = df['close'].pct_change().iloc[-252:].std() * np.sqrt(252)
             
-            if signal:
-                logger.info(f"Generated {signal} signal for {contract.symbol} (Regime: {market_regime})")
-                signals[contract.symbol] = {
-                    'action': signal,
-                    'price': last_row['close'],
-                    'volatility': last_row.get('volatility', df['close'].pct_change().std() * np.sqrt(252)),
-                    'signal_strength': abs(last_row['ma_diff']),
-                    'market_regime': market_regime
-                }
-                
-        return signals
\ No newline at end of file
+            logger.info("Generated %s signal for %s (Regime: %s)", signal, contract.symbol, market_regime)
+            return {
+                'action': signal,
+                'price': last_close,
+                'volatility': volatility,
+                'signal_strength': abs(ma_diff),
+                'market_regime': market_regime
+            }
\ No newline at end of file
@@ -2,10 +2,117 @@
 import logging
 import numpy as np
 from strategies.base_strategy import BaseStrategy
-from config.settings import LOOKBACK_PERIOD
+from utils.jit import jit
+from config.settings import LOOKBACK_PERIOD, BREAKOUT_MIN_MOVE
 
 logger = logging.getLogger('strategies.volatility')
 
+@jit(cache=True)
+def welford_update(mean, m2, count, value):
+    """Fold one value into a running mean and sum of squared deviations.
+    
+    Welford's update avoids the cancellation the sum-of-squares identity
+    suffers when the mean is large relative to the spread. count is the
+    number of values seen including this one.
+    """
+    delta = value - mean
+    mean += delta / count
+    return mean, m2 + delta * (value - mean)
+
+def make_breakout_kernel(lookback, volatility_factor):
+    """Build the completed-bar band kernel with the lookback fixed as a constant.
+    
+    The kernel takes a 2-D float32 array holding, per contract, the
+    lookback+1 closes before the current bar. That fixes the previous bar's
+    bands, and the return statistics and close sum the current bar's window
+    shares with them, so the current bar only has to fold in its own close.
+    It returns (prev_upper_band, prev_lower_band, ret_mean, ret_m2,
+    close_sum) arrays, the last three covering the window's completed bars.
+    
+    Args:
+        lookback: Lookback period for the bands
+        volatility_factor: Band width in standard deviations
+        
+    Returns:
+        function: Kernel, compiled when Numba is available
+    """
+    n = lookback
+    
+    def kernel(closes):
+        rows = closes.shape[0]
+        prev_upper_band = np.empty(rows)
+        prev_lower_band = np.empty(rows)
+        ret_mean = np.empty(rows)
+        ret_m2 = np.empty(rows)
+        close_sum = np.empty(rows)
+        
+        for row in range(rows):
+            c = closes[row]
+            
+            # Returns and closes both windows share
+            mean = 0.0
+            m2 = 0.0
+            total = 0.0
+            for k in range(2, n + 1):
+                mean, m2 = welford_update(mean, m2, k - 1, c[k] / c[k-1] - 1.0)
+                total += c[k]
+            ret_mean[row] = mean
+            ret_m2[row] = m2
+            close_sum[row] = total
+            
+            # Previous window adds the oldest return and close; bands use daily volatility
+            _, prev_m2 = welford_update(mean, m2, n, c[1] / c[0] - 1.0)
+            prev_sma = (total + c[1]) / n
+            prev_width = c[n] * np.sqrt(prev_m2 / (n - 1)) * volatility_factor
+            prev_upper_band[row] = prev_sma + prev_width
+            prev_lower_band[row] = prev_sma - prev_width
+        
+        return prev_upper_band, prev_lower_band, ret_mean, ret_m2, close_sum
+    
+    return jit(kernel)
+
+def window_sum(values, window):
+    """Trailing sums over every full window of a 1-D array via one cumulative sum."""
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    return csum[window:] - csum[:-window]
+
+def band_history(closes, lookback, volatility_factor):
+    """Calculate volatility bands for every bar of a close series.
+    
+    Window sums come from cumulative sums, so the whole series costs O(N)
+    regardless of lookback. Returns are centred on their overall mean first,
+    which keeps the sum-of-squares variance well conditioned.
+    
+    Args:
+        closes: 1-D array of closing prices
+        lookback: Lookback period for the bands
+        volatility_factor: Band width in standard deviations
+        
+    Returns:
+        tuple: (upper_band, lower_band, volatility) arrays aligned with closes,
+        NaN until lookback+1 bars are available
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    upper_band = np.full(len(closes), np.nan)
+    lower_band = np.full(len(closes), np.nan)
+    volatility = np.full(len(closes), np.nan)
+    if len(closes) < lookback + 1:
+        return upper_band, lower_band, volatility
+    
+    returns = closes[1:] / closes[:-1] - 1.0
+    dev = returns - returns.mean()
+    ret_sum = window_sum(dev, lookback)
+    ret_sq = window_sum(dev * dev, lookback)
+    daily_vol = np.sqrt(np.maximum(ret_sq - ret_sum * ret_sum / lookback, 0.0) / (lookback - 1))
+    
+    # Both series are trimmed to windows ending at bar lookback onwards
+    sma = window_sum(closes, lookback)[1:] / lookback
+    band_width = closes[lookback:] * daily_vol * volatility_factor
+    upper_band[lookback:] = sma + band_width
+    lower_band[lookback:] = sma - band_width
+    volatility[lookback:] = daily_vol * np.sqrt(252)
+    return upper_band, lower_band, volatility
+
 class VolatilityBreakout(BaseStrategy):
     """Volatility breakout strategy.
     
@@ -14,76 +121,167 @@ class VolatilityBreakout(BaseStrategy):
     when it breaks below.
     """
     
-    def __init__(self, data_provider, volatility_factor=2.0, lookback=LOOKBACK_PERIOD):
+    def __init__(self, data_provider, volatility_factor=2.0, lookback=LOOKBACK_PERIOD,
+                 min_move=BREAKOUT_MIN_MOVE):
         """Initialize the volatility breakout strategy.
         
         Args:
             data_provider: Data provider object
             volatility_factor: Multiplier for volatility bands (e.g., 2.0 = 2 standard deviations)
             lookback: Lookback period for calculating bands
+            min_move: Smallest fractional last-bar move worth computing bands for
         """
         super().__init__(data_provider)
         self.volatility_factor = volatility_factor
         self.lookback = lookback
+        self.min_move = min_move
+        self._state = {}  # Symbol -> (last completed bar date, breakout kernel values)
+        self._buffers = {}  # Scratch arrays reused across cycles, by name
+        self._breakout_kernel = make_breakout_kernel(lookback, volatility_factor)
+    
+    def __getstate__(self):
+        # The kernel is a local closure, so rebuild it instead of pickling it
+        state = super().__getstate__()
+        del state['_breakout_kernel']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._breakout_kernel = make_breakout_kernel(self.lookback, self.volatility_factor)
+    
+    def _scratch(self, name, rows, cols, dtype):
+        """Get a reusable (rows, cols) scratch array, growing it only when too small."""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape[0] < rows or buf.shape[1] != cols:
+            buf = np.empty((max(rows, 0 if buf is None else buf.shape[0]), cols), dtype=dtype)
+            self._buffers[name] = buf
+        return buf[:rows]
+    
+    def history_duration(self):
+        """Get the IB duration string of history this strategy needs."""
+        return f'{self.lookback+10} D'  # Get a bit more data than needed
     
-    def generate_signals(self, contracts):
+    def generate_signals(self, contracts, history=None):
         """Generate trading signals based on volatility breakouts.
         
         Args:
             contracts: List of contract objects to analyze
+            history: Optional prefetched DataFrames by symbol
             
         Returns:
             dict: Dictionary of signals by symbol
         """
-        signals = {}
+        # Get historical data for every contract in one batch
+        if history is None:
+            history = self.fetch_history(contracts, duration=self.history_duration())
         
-        for contract in contracts:
-            # Get historical data
-            df = self.data_provider.get_historical_data(
-                contract,
-                duration=f'{self.lookback+10} D'  # Get a bit more data than needed
-            )
-            
-            if df is None or len(df) < self.lookback + 2:
-                logger.warning(f"Insufficient data for {contract.symbol}")
+        # Pull each usable close series out once as a positional array
+        n = self.lookback
+        usable = []
+        for symbol in [contract.symbol for contract in contracts]:
+            df = history[symbol]
+            if df is None or len(df) < n + 2:
+                logger.warning("Insufficient data for %s", symbol)
                 continue
-                
-            # Calculate indicators
-            df['returns'] = df['close'].pct_change()
-            df['volatility'] = df['returns'].rolling(self.lookback).std() * np.sqrt(252)  # Annualized
             
-            # Calculate the center of the band (moving average)
-            df['sma'] = df['close'].rolling(self.lookback).mean()
-            
-            # Calculate volatility bands
-            band_width = df['close'] * df['volatility'] * self.volatility_factor / np.sqrt(252)
-            df['upper_band'] = df['sma'] + band_width
-            df['lower_band'] = df['sma'] - band_width
+            # A breakout needs a material last-bar move; skip the band math otherwise
+            c = df['close'].to_numpy()
+            if abs(c[-1] - c[-2]) < self.min_move * abs(c[-1]):
+                continue
+            bar_date = df['date'].iat[-2] if 'date' in df.columns else None
+            usable.append((symbol, c, bar_date))
+        
+        if not usable:
+            return {}
+        
+        # Completed bars don't change, so reuse their state until a new bar arrives
+        states = self._scratch('states', len(usable), 5, np.float64)
+        stale = []
+        for row, (symbol, _, bar_date) in enumerate(usable):
+            cached = self._state.get(symbol)
+            if bar_date is not None and cached is not None and cached[0] == bar_date:
+                states[row] = cached[1]
+            else:
+                stale.append((row, bar_date))
+        
+        if stale:
+            # Bars arrive as float32, so stack them without widening; the kernel accumulates in float64
+            completed = self._scratch('completed', len(stale), n + 1, np.float32)
+            for i, (row, _) in enumerate(stale):
+                completed[i] = usable[row][1][-(n + 2):-1]
+            fresh = np.column_stack(self._breakout_kernel(completed))
+            for i, (row, bar_date) in enumerate(stale):
+                states[row] = fresh[i]
+                if bar_date is not None:
+                    self._state[usable[row][0]] = (bar_date, fresh[i])
+        
+        prev_upper_band, prev_lower_band, ret_mean, ret_m2, close_sum = states.T
+        close = np.array([c[-1] for _, c, _ in usable], dtype=np.float64)
+        prev_close = np.array([c[-2] for _, c, _ in usable], dtype=np.float64)
+        
+        # Fold the current bar's return into each window with one Welford step
+        _, ret_m2 = welford_update(ret_mean, ret_m2, n, close / prev_close - 1.0)
+        daily_vol = np.sqrt(ret_m2 / (n - 1))
+        sma = (close_sum + close) / n
+        band_width = close * daily_vol * self.volatility_factor
+        upper_band = sma + band_width
+        lower_band = sma - band_width
+        volatility = daily_vol * np.sqrt(252)
+        
+        # Buy signal: price crosses above upper band
+        buy = (prev_close <= prev_upper_band) & (close > upper_band)
+        
+        # Sell signal: price crosses below lower band
+        sell = (prev_close >= prev_lower_band) & (close < lower_band)
+        
+        # The bands never invert, so the masks are disjoint; only triggered rows are visited
+        signals = {}
+        for signal, mask in (('BUY', buy), ('SELL', sell)):
+            for row in np.flatnonzero(mask):
+                symbol = usable[row][0]
+                logger.info("Generated %s signal for %s", signal, symbol)
+                signals[symbol] = {
+                    'action': signal,
+                    'price': close[row],
+                    'volatility': volatility[row]
+                }
+        
+        return signals
+    
+    def generate_signals_batch(self, prices):
+        """Generate the signals every day of a backtest would have produced.
+        
+        Batch path for backtests: bands for each whole series are computed
+        in one pass instead of re-running generate_signals on each prefix.
+        
+        Args:
+            prices: (bars, symbols) array of each symbol's own consecutive
+                closes, NaN before a symbol has data
             
-            # Get the last two rows
-            if len(df) < 2:
+        Returns:
+            tuple: (actions, volatility) arrays shaped like prices; actions is
+            int8 with 1 for BUY, -1 for SELL and 0 for no signal
+        """
+        n = self.lookback
+        actions = np.zeros(prices.shape, dtype=np.int8)
+        volatility = np.full(prices.shape, np.nan)
+        
+        for j in range(prices.shape[1]):
+            available = np.flatnonzero(~np.isnan(prices[:, j]))
+            if len(available) < n + 2:
                 continue
-                
-            last_row = df.iloc[-1]
-            prev_row = df.iloc[-2]
             
-            # Determine signal
-            signal = None
+            start = available[0]
+            c = prices[start:, j]
+            upper_band, lower_band, vol = band_history(c, n, self.volatility_factor)
+            prev_close, close = c[:-1], c[1:]
+            moved = np.abs(close - prev_close) >= self.min_move * np.abs(close)
             
-            # Buy signal: price crosses above upper band
-            if prev_row['close'] <= prev_row['upper_band'] and last_row['close'] > last_row['upper_band']:
-                signal = 'BUY'
-                
-            # Sell signal: price crosses below lower band
-            elif prev_row['close'] >= prev_row['lower_band'] and last_row['close'] < last_row['lower_band']:
-                signal = 'SELL'
+            # Same crossings as generate_signals, evaluated for every bar at once
+            buy = moved & (prev_close <= upper_band[:-1]) & (close > upper_band[1:])
+            sell = moved & (prev_close >= lower_band[:-1]) & (close < lower_band[1:])
             
-            if signal:
-                logger.info(f"Generated {signal} signal for {contract.symbol}")
-                signals[contract.symbol] = {
-                    'action': signal,
-                    'price': last_row['close'],
-                    'volatility': last_row['volatility']
-                }
-                
-        return signals
\ No newline at end of file
+            actions[start + 1:, j] = buy.astype(np.int8) - sell.astype(np.int8)
+            volatility[start:, j] = vol
+        
+        return actions, volatility
\ No newline at end of file
@@ -4,10 +4,20 @@ import sys
 import pandas as pd
 import numpy as np
 import json
+from functools import reduce
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 import matplotlib.pyplot as plt
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import logging
+import logging.handlers
+import multiprocessing
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
 
 # Add parent directory to path to import project modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,7 +29,8 @@ from strategies.volatility import VolatilityBreakout
 from strategies.mean_reversion import MeanReversionStrategy
 from strategies.ensemble import EnsembleStrategy
 from data.historical import HistoricalDataProvider
-from utils.logging_config import setup_logging
+from utils.logging_config import setup_logging, setup_worker_logging
+from utils.jit import jit
 
 # Configure logging for tests
 logger = logging.getLogger('eco_etf_bot.tests.backtest')
@@ -29,33 +40,426 @@ class MockHistoricalData:
     
     def __init__(self, data_dict):
         """Initialize with preloaded historical data."""
-        self.data = data_dict
+        self.full_data = data_dict
+        self.date_ends = None    # Symbol -> rows up to each calendar date
+        self.current_idx = None  # Calendar position data is visible up to
+    
+    def set_calendar(self, dates):
+        """Index each symbol's rows against a sorted calendar of backtest dates.
+        
+        Once set, advancing current_idx exposes the history up to that date
+        without rebuilding any per-day data.
+        """
+        self.date_ends = {symbol: df['date'].searchsorted(dates, side='right')
+                          for symbol, df in self.full_data.items()}
+        self.current_idx = None
+    
+    def _visible_rows(self, symbol):
+        """Get how many of a symbol's rows are visible at the cursor, or None for all."""
+        if self.current_idx is None or self.date_ends is None:
+            return None
+        return self.date_ends[symbol][self.current_idx]
     
     def get_historical_data(self, contract, duration=None, bar_size='1 day',
                            what_to_show='MIDPOINT', use_rth=True):
         """Get historical data from preloaded data."""
         symbol = contract.symbol
-        if symbol in self.data:
-            return self.data[symbol].copy()
-        return None
+        if symbol not in self.full_data:
+            return None
+        # Strategies treat history as read-only, so hand out a view of the
+        # visible rows; _run_single_strategy checks the shared data afterwards
+        end = self._visible_rows(symbol)
+        if end == 0:
+            return None
+        return self.full_data[symbol] if end is None else self.full_data[symbol].iloc[:end]
+    
+    def fingerprint(self):
+        """Hash every preloaded frame, to detect strategies mutating shared history."""
+        return {symbol: pd.util.hash_pandas_object(df).to_numpy()
+                for symbol, df in self.full_data.items()}
+    
+    @staticmethod
+    def precompute_indicators(close, sma_short=5, sma_long=20):
+        """Calculate indicator columns for a whole close series in one pass.
+        
+        Window sums come from cumulative sums, making each column O(N)
+        instead of a pandas rolling pass per column.
+        
+        Returns:
+            dict: Column name -> array aligned with close, NaN until its window fills
+        """
+        close = np.asarray(close, dtype=np.float64)
+        
+        def trailing_mean(values, window):
+            out = np.full(len(values), np.nan)
+            if len(values) >= window:
+                cs = np.concatenate(([0.0], np.cumsum(values)))
+                out[window - 1:] = (cs[window:] - cs[:-window]) / window
+            return out
+        
+        returns = np.full(len(close), np.nan)
+        returns[1:] = close[1:] / close[:-1] - 1.0
+        
+        # Rolling sample variance from sums of centred returns and their squares
+        window = 20
+        volatility = np.full(len(close), np.nan)
+        if len(close) > window:
+            dev = returns[1:] - returns[1:].mean()
+            mean = trailing_mean(dev, window)[window - 1:]
+            mean_sq = trailing_mean(dev * dev, window)[window - 1:]
+            var = np.maximum(mean_sq - mean * mean, 0.0) * window / (window - 1)
+            volatility[window:] = np.sqrt(var) * (252 ** 0.5)  # Annualized
+        
+        return {
+            f'SMA{sma_short}': trailing_mean(close, sma_short),
+            f'SMA{sma_long}': trailing_mean(close, sma_long),
+            'returns': returns,
+            'volatility': volatility,
+        }
     
     def calculate_indicators(self, df, sma_short=5, sma_long=20):
         """Calculate indicators on a dataframe."""
         if df is None or len(df) < sma_long:
             return None
+        
+        # assign() returns a new frame, so the original is not modified
+        return df.assign(**self.precompute_indicators(df['close'], sma_short, sma_long))
+
+class BacktestPortfolio:
+    """Backtest portfolio held as parallel arrays indexed by symbol position."""
+    
+    def __init__(self, n_symbols, cash):
+        """Initialize an empty portfolio with starting cash."""
+        self.cash = float(cash)
+        self.qty = np.zeros(n_symbols, dtype=np.int64)
+        self.entry_price = np.zeros(n_symbols)
+        self.entry_day = np.zeros(n_symbols, dtype=np.int64)  # Calendar index of each entry
+        self.marks = np.zeros(n_symbols)  # Last known price of each holding
+    
+    def value(self):
+        """Get cash plus the marked value of every holding."""
+        return self.cash + float(self.qty @ self.marks)
+
+# Signal actions as codes for the compiled portfolio step
+HOLD, BUY, SELL = 0, 1, -1
+SIGNAL_CODES = {'BUY': BUY, 'SELL': SELL}
+
+@jit(cache=True)
+def _simulate_step(actions, prices, volatilities, qty, entry_price, marks, cash):
+    """Apply one day's signals to the array portfolio, updating it in place.
+    
+    Without a usable volatility a buy is 100 shares; otherwise it is sized
+    to risk 1% of cash, capped at 1000 shares.
+    
+    Args:
+        actions: int8 signal code per symbol (BUY, SELL or HOLD)
+        prices: Signal price per symbol
+        volatilities: Signal volatility per symbol, NaN when not given
+        qty: Held quantity per symbol
+        entry_price: Entry price per held symbol
+        marks: Last known price per held symbol
+        cash: Cash before the day's trades
+        
+    Returns:
+        tuple: (cash, executed, traded_qty, profit) where executed holds the
+        code of the trade made for each symbol, or HOLD
+    """
+    n = len(actions)
+    executed = np.zeros(n, dtype=np.int8)
+    traded_qty = np.zeros(n, dtype=np.int64)
+    profit = np.zeros(n)
+    
+    for i in range(n):
+        price = prices[i]
+        if actions[i] == BUY and qty[i] == 0:
+            # Default to 100 shares or position sizing based on volatility
+            vol = volatilities[i]
+            if np.isnan(vol) or vol <= 0:
+                quantity = 100
+            else:
+                target_risk = cash * 0.01  # 1% risk per trade
+                quantity = min(max(1, int(target_risk / (price * vol * 0.1))), 1000)
             
-        # Make a copy to avoid modifying the original
-        result = df.copy()
+            cost = price * quantity
+            if cost <= cash:
+                qty[i] = quantity
+                entry_price[i] = price
+                marks[i] = price
+                cash -= cost
+                executed[i] = BUY
+                traded_qty[i] = quantity
+        
+        elif actions[i] == SELL and qty[i] != 0:
+            proceeds = price * qty[i]
+            profit[i] = proceeds - entry_price[i] * qty[i]
+            cash += proceeds
+            traded_qty[i] = qty[i]
+            qty[i] = 0
+            executed[i] = SELL
+    
+    return cash, executed, traded_qty, profit
+
+@jit(cache=True)
+def _equity_stats(equity):
+    """Calculate daily return statistics and maximum drawdown of an equity curve.
+    
+    Return mean and variance use Welford's update, and the running peak is
+    tracked in the same pass.
+    
+    Returns:
+        tuple: (mean_return, std_return, max_drawdown_pct); std is NaN with
+        fewer than two returns
+    """
+    mean = 0.0
+    m2 = 0.0
+    peak = equity[0]
+    max_drawdown = 0.0
+    for i in range(1, len(equity)):
+        r = equity[i] / equity[i-1] - 1.0
+        delta = r - mean
+        mean += delta / i
+        m2 += delta * (r - mean)
+        
+        peak = max(peak, equity[i])
+        max_drawdown = min(max_drawdown, (equity[i] - peak) / peak * 100)
+    
+    count = len(equity) - 1
+    std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+    return mean, std, max_drawdown
+
+def _run_single_strategy(strategy_name, strategy, data, symbols, common_dates, days, initial_capital):
+    """Simulate one strategy day by day over the preloaded data.
+    
+    Module-level so it can run in a worker process; each strategy's
+    simulation is independent and keeps its own sequential portfolio state.
+    
+    Returns:
+        dict: Backtest results for the strategy
+    """
+    logger.info(f"Running backtest for {strategy_name} strategy")
+    
+    # Initialize results for this strategy, sized for every simulated day
+    warmup = 20  # Need at least 20 days for most indicators
+    n_days = max(len(common_dates) - warmup, 0)
+    equity_curve = np.empty(n_days + 1, dtype=np.float64)
+    equity_curve[0] = initial_capital
+    strategy_results = {
+        'portfolio_value': np.empty(n_days, dtype=np.float64),
+        'cash': np.empty(n_days, dtype=np.float64),
+        'positions': np.zeros((n_days, len(symbols)), dtype=np.int32),  # Held quantity per day and symbol
+        'trades': [],
+        'equity_curve': equity_curve,
+        'symbols': symbols,
+        'days': days
+    }
+    
+    # Create a portfolio for backtesting
+    sym_to_idx = {symbol: i for i, symbol in enumerate(symbols)}
+    portfolio = BacktestPortfolio(len(symbols), initial_capital)
+    trades = []
+    
+    # Per-day signal buffers
+    actions = np.zeros(len(symbols), dtype=np.int8)
+    prices = np.zeros(len(symbols))
+    volatilities = np.zeros(len(symbols))
+    
+    # Dates are sorted, so each day's history is a prefix of every symbol's
+    # rows; the provider finds the prefix lengths once and a cursor selects the day
+    provider = strategy.data_provider
+    provider.full_data = data
+    provider.set_calendar(common_dates)
+    
+    # Each symbol's close on every calendar date, NaN where it has no data yet
+    price_matrix = np.full((len(common_dates), len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        if symbol in data:
+            ends = provider.date_ends[symbol]
+            has_data = ends > 0
+            price_matrix[has_data, j] = data[symbol]['close'].to_numpy(dtype=np.float64)[ends[has_data] - 1]
+    
+    # Strategies read contract.symbol, so give them attribute access
+    contracts = [SimpleNamespace(symbol=symbol) for symbol in symbols]
+    
+    # Strategies get views of the shared history, so make sure none writes to it
+    fingerprint = provider.fingerprint()
+    
+    # Strategies with a batch path produce every day's signals up front. The
+    # per-day path sees each symbol's own rows, holidays included, so the
+    # batch runs on full histories (right-aligned, NaN-padded in front) and
+    # each calendar date then reads the signal of its symbol's last visible row
+    batch_actions = batch_volatility = None
+    if getattr(strategy, 'generate_signals_batch', None) is not None:
+        lengths = [len(data[symbol]) if symbol in data else 0 for symbol in symbols]
+        rows = max(lengths, default=0)
+        history = np.full((rows, len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            if lengths[j]:
+                history[rows - lengths[j]:, j] = data[symbol]['close'].to_numpy(dtype=np.float64)
+        row_actions, row_volatility = strategy.generate_signals_batch(history)
+        
+        batch_actions = np.zeros(price_matrix.shape, dtype=np.int8)
+        batch_volatility = np.full(price_matrix.shape, np.nan)
+        for j, symbol in enumerate(symbols):
+            if lengths[j]:
+                ends = provider.date_ends[symbol]
+                has_data = ends > 0
+                history_rows = rows - lengths[j] + ends[has_data] - 1
+                batch_actions[has_data, j] = row_actions[history_rows, j]
+                batch_volatility[has_data, j] = row_volatility[history_rows, j]
+    
+    # Calendar dates as integer day numbers, so holding periods are a subtraction
+    day_numbers = common_dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    
+    # Run the backtest day by day
+    for day_idx, current_date in enumerate(tqdm(common_dates, desc=f"Testing {strategy_name}")):
+        # Skip the first few days to allow for indicator calculation
+        if day_idx < warmup:
+            continue
+        
+        if batch_actions is not None:
+            # Batch signals trade at the day's close
+            actions[:] = batch_actions[day_idx]
+            prices[:] = price_matrix[day_idx]
+            volatilities[:] = batch_volatility[day_idx]
+        else:
+            # Expose data up to this date to the strategy
+            provider.current_idx = day_idx
+            
+            # Generate signals for current day
+            signals = strategy.generate_signals(contracts)
+            
+            # Encode the day's signals as arrays for the compiled portfolio step
+            actions.fill(HOLD)
+            prices.fill(np.nan)
+            volatilities.fill(np.nan)
+            for symbol, signal_data in signals.items():
+                i = sym_to_idx[symbol]
+                actions[i] = SIGNAL_CODES.get(signal_data['action'], HOLD)
+                prices[i] = signal_data['price']
+                volatilities[i] = signal_data.get('volatility', np.nan)
+        
+        portfolio.cash, executed, traded_qty, profits = _simulate_step(
+            actions, prices, volatilities, portfolio.qty, portfolio.entry_price,
+            portfolio.marks, portfolio.cash)
+        
+        # Record the trades that went through
+        for i in np.flatnonzero(executed):
+            symbol = symbols[i]
+            price = float(prices[i])
+            quantity = int(traded_qty[i])
+            if executed[i] == BUY:
+                portfolio.entry_day[i] = day_idx
+                trades.append({
+                    'date': current_date,
+                    'symbol': symbol,
+                    'action': 'BUY',
+                    'quantity': quantity,
+                    'price': price,
+                    'cost': price * quantity,
+                    'strategy': strategy_name
+                })
+            else:
+                trades.append({
+                    'date': current_date,
+                    'symbol': symbol,
+                    'action': 'SELL',
+                    'quantity': quantity,
+                    'price': price,
+                    'proceeds': price * quantity,
+                    'profit': float(profits[i]),
+                    'entry_price': float(portfolio.entry_price[i]),
+                    'entry_date': common_dates[portfolio.entry_day[i]],
+                    'holding_days': int(day_numbers[day_idx] - day_numbers[portfolio.entry_day[i]]),
+                    'strategy': strategy_name
+                })
         
-        # Calculate simple moving averages
-        result[f'SMA{sma_short}'] = result['close'].rolling(sma_short).mean()
-        result[f'SMA{sma_long}'] = result['close'].rolling(sma_long).mean()
+        # Update current prices for all positions; without data the price is assumed unchanged
+        today = price_matrix[day_idx]
+        np.copyto(portfolio.marks, today, where=(portfolio.qty != 0) & ~np.isnan(today))
         
-        # Calculate volatility (20-day rolling standard deviation of returns)
-        result['returns'] = result['close'].pct_change()
-        result['volatility'] = result['returns'].rolling(20).std() * (252 ** 0.5)  # Annualized
+        # Calculate total portfolio value
+        portfolio_value = portfolio.value()
         
-        return result
+        # Store the portfolio state for this day
+        row = day_idx - warmup
+        strategy_results['portfolio_value'][row] = portfolio_value
+        strategy_results['cash'][row] = portfolio.cash
+        strategy_results['positions'][row] = portfolio.qty  # Prices and entries come from the trade log
+        equity_curve[row + 1] = portfolio_value
+    
+    after = provider.fingerprint()
+    changed = [symbol for symbol in fingerprint if not np.array_equal(fingerprint[symbol], after[symbol])]
+    if changed:
+        raise RuntimeError(f"{strategy_name} modified the shared history of {', '.join(changed)}")
+    
+    # Record all trades
+    strategy_results['trades'] = trades
+    
+    # Calculate performance metrics
+    if len(equity_curve) > 1:
+        initial_value = float(equity_curve[0])
+        final_value = float(equity_curve[-1])
+        
+        # Total return
+        total_return = (final_value - initial_value) / initial_value * 100
+        
+        # Annualized return (assuming 252 trading days in a year)
+        days_held = len(equity_curve) - 1
+        annual_return = ((final_value / initial_value) ** (252 / days_held) - 1) * 100 if days_held > 0 else 0
+        
+        # Daily return mean/std and maximum drawdown in one pass over the equity curve
+        mean_return, std_return, max_drawdown = _equity_stats(equity_curve)
+        
+        # Volatility (annualized)
+        volatility = std_return * np.sqrt(252) * 100
+        
+        # Sharpe ratio (assuming risk-free rate of 0% for simplicity)
+        sharpe = (mean_return * 252) / (std_return * np.sqrt(252)) if std_return > 0 else 0
+        
+        # Win rate, from one array of per-trade profits (buys count as zero)
+        trades = strategy_results['trades']
+        profits = np.fromiter((t.get('profit', 0.0) for t in trades), dtype=np.float64, count=len(trades))
+        wins = profits[profits > 0]
+        losses = profits[profits <= 0]
+        win_rate = wins.size / profits.size * 100 if trades else 0
+        
+        # Average profit per trade
+        if trades:
+            total_profit = float(profits.sum())
+            avg_profit = total_profit / profits.size
+            avg_win = float(wins.mean()) if wins.size else 0
+            avg_loss = float(losses.mean()) if losses.size else 0
+            loss_sum = losses.sum()
+            profit_factor = abs(float(wins.sum() / loss_sum)) if losses.size and loss_sum != 0 else float('inf')
+        else:
+            total_profit = 0
+            avg_profit = 0
+            avg_win = 0
+            avg_loss = 0
+            profit_factor = 0
+        
+        # Store metrics
+        strategy_results['metrics'] = {
+            'initial_capital': initial_value,
+            'final_value': final_value,
+            'total_return_pct': total_return,
+            'annual_return_pct': annual_return,
+            'volatility_pct': volatility,
+            'sharpe_ratio': sharpe,
+            'max_drawdown_pct': max_drawdown,
+            'win_rate_pct': win_rate,
+            'trade_count': len(trades),
+            'total_profit': total_profit,
+            'avg_profit_per_trade': avg_profit,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'profit_factor': profit_factor
+        }
+    
+    # The strategy's thread pools outlive every simulated day; release them once
+    strategy.close()
+    
+    return strategy_results
 
 class Backtest:
     """Backtest trading strategies on historical data."""
@@ -75,6 +479,7 @@ class Backtest:
             
         self.strategies = {}
         self.results = {}
+        self._ranking = []  # (name, results) by total return, best first
     
     def load_data(self, symbols, days=252):
         """Load or download historical data for symbols.
@@ -91,11 +496,27 @@ class Backtest:
         # Check if we have cached data
         for symbol in symbols:
             data_file = os.path.join(self.data_folder, f"{symbol}_data.csv")
+            array_file = os.path.join(self.data_folder, f"{symbol}_data.npz")
             
-            if os.path.exists(data_file):
+            if os.path.exists(array_file) and (not os.path.exists(data_file) or
+                                               os.path.getmtime(array_file) >= os.path.getmtime(data_file)):
+                # Load the parsed columns saved on a previous run, skipping CSV parsing
+                with np.load(array_file) as arrays:
+                    df = pd.DataFrame({column: arrays[column] for column in arrays.files})
+                
+                # Only use the requested number of days
+                if len(df) > days:
+                    df = df.tail(days)
+                
+                data[symbol] = df
+                logger.info(f"Loaded {len(df)} days of data for {symbol}")
+            elif os.path.exists(data_file):
                 # Load data from file
                 df = pd.read_csv(data_file, parse_dates=['date'])
                 
+                # Keep the parsed columns as arrays for the next run
+                np.savez(array_file, **{column: df[column].to_numpy() for column in df.columns})
+                
                 # Only use the requested number of days
                 if len(df) > days:
                     df = df.tail(days)
@@ -107,15 +528,17 @@ class Backtest:
                 # For now, we'll just create mock data
                 logger.warning(f"No cached data for {symbol}, creating mock data")
                 
-                # Create mock data for testing
+                # Create mock data for testing from one random walk so OHLC stay consistent
                 date_range = pd.date_range(end=datetime.now(), periods=days, freq='B')
+                rng = np.random.default_rng()
+                base = 100 + 10 * rng.standard_normal(days).cumsum()
                 mock_data = pd.DataFrame({
                     'date': date_range,
-                    'open': np.random.normal(100, 10, size=days).cumsum(),
-                    'high': np.random.normal(100, 10, size=days).cumsum() + 2,
-                    'low': np.random.normal(100, 10, size=days).cumsum() - 2,
-                    'close': np.random.normal(100, 10, size=days).cumsum(),
-                    'volume': np.random.randint(1000, 1000000, size=days)
+                    'open': base,
+                    'high': base + 2,
+                    'low': base - 2,
+                    'close': base,
+                    'volume': rng.integers(1000, 1000000, size=days)
                 })
                 
                 # Save mock data for reuse
@@ -168,243 +591,56 @@ class Backtest:
         if not self.strategies:
             self.register_strategies()
         
-        # Update mock data provider for each strategy
-        for strategy_name, strategy in self.strategies.items():
-            strategy.data_provider.data = data
+        # Determine the common date range for all symbols once for every strategy
+        date_arrays = [data[symbol]['date'].to_numpy(dtype='datetime64[ns]')
+                       for symbol in symbols if symbol in data]
+        common_dates = pd.DatetimeIndex(reduce(np.intersect1d, date_arrays)) if date_arrays else pd.DatetimeIndex([])
+        
+        if len(common_dates) == 0:
+            logger.error("No common dates found across symbols")
+            self.results = {}
+            self._ranking = []
+            return self.results
+        
+        # Only use the requested number of days
+        common_dates = common_dates[-days:]
         
         # Run backtest for each strategy
         results = {}
         
-        for strategy_name, strategy in self.strategies.items():
-            logger.info(f"Running backtest for {strategy_name} strategy")
-            
-            # Initialize results for this strategy
-            strategy_results = {
-                'portfolio_value': [],
-                'cash': [],
-                'positions': [],
-                'trades': [],
-                'equity_curve': [initial_capital],
-                'symbols': symbols,
-                'days': days
-            }
-            
-            # Create a portfolio for backtesting
-            portfolio = {
-                'cash': initial_capital,
-                'positions': {},
-                'trades': []
-            }
-            
-            # Determine the common date range for all symbols
-            common_dates = None
-            for symbol in symbols:
-                if symbol in data:
-                    symbol_dates = data[symbol]['date']
-                    if common_dates is None:
-                        common_dates = set(symbol_dates)
-                    else:
-                        common_dates = common_dates.intersection(set(symbol_dates))
-            
-            if not common_dates:
-                logger.error("No common dates found across symbols")
-                continue
-            
-            # Sort common dates
-            common_dates = sorted(list(common_dates))
-            
-            # Only use the requested number of days
-            if len(common_dates) > days:
-                common_dates = common_dates[-days:]
-            
-            # Run the backtest day by day
-            for day_idx, current_date in enumerate(tqdm(common_dates, desc=f"Testing {strategy_name}")):
-                # Skip the first few days to allow for indicator calculation
-                if day_idx < 20:  # Need at least 20 days for most indicators
-                    continue
-                
-                # Create a dictionary to hold the data up to this date for each symbol
-                historical_data = {}
-                for symbol in symbols:
-                    if symbol in data:
-                        # Get data up to current date
-                        symbol_data = data[symbol][data[symbol]['date'] <= current_date]
-                        if len(symbol_data) > 0:
-                            historical_data[symbol] = symbol_data
-                
-                # Update mock data provider with data up to this point
-                for strat_name, strat in self.strategies.items():
-                    strat.data_provider.data = historical_data
-                
-                # Generate signals for current day
-                contracts = [{'symbol': symbol} for symbol in symbols]
-                signals = strategy.generate_signals(contracts)
-                
-                # Process signals and update portfolio
-                for symbol, signal_data in signals.items():
-                    action = signal_data['action']
-                    price = signal_data['price']
-                    
-                    # Default to 100 shares or position sizing based on volatility
-                    if 'volatility' in signal_data:
-                        # Simple volatility-based position sizing
-                        volatility = signal_data['volatility']
-                        target_risk = portfolio['cash'] * 0.01  # 1% risk per trade
-                        quantity = max(1, int(target_risk / (price * volatility * 0.1)))
-                        quantity = min(quantity, 1000)  # Cap at 1000 shares
-                    else:
-                        quantity = 100
-                    
-                    # Implement the signal
-                    if action == 'BUY' and symbol not in portfolio['positions']:
-                        # Check if we have enough cash
-                        cost = price * quantity
-                        if cost <= portfolio['cash']:
-                            # Buy the stock
-                            portfolio['positions'][symbol] = {
-                                'quantity': quantity,
-                                'entry_price': price,
-                                'entry_date': current_date,
-                                'current_price': price,
-                                'current_value': price * quantity
-                            }
-                            portfolio['cash'] -= cost
-                            
-                            # Record the trade
-                            portfolio['trades'].append({
-                                'date': current_date,
-                                'symbol': symbol,
-                                'action': 'BUY',
-                                'quantity': quantity,
-                                'price': price,
-                                'cost': cost,
-                                'strategy': strategy_name
-                            })
-                    
-                    elif action == 'SELL' and symbol in portfolio['positions']:
-                        # Sell the stock
-                        position = portfolio['positions'][symbol]
-                        proceeds = price * position['quantity']
-                        profit = proceeds - (position['entry_price'] * position['quantity'])
-                        
-                        portfolio['cash'] += proceeds
-                        
-                        # Record the trade
-                        portfolio['trades'].append({
-                            'date': current_date,
-                            'symbol': symbol,
-                            'action': 'SELL',
-                            'quantity': position['quantity'],
-                            'price': price,
-                            'proceeds': proceeds,
-                            'profit': profit,
-                            'entry_price': position['entry_price'],
-                            'entry_date': position['entry_date'],
-                            'holding_days': (pd.to_datetime(current_date) - 
-                                           pd.to_datetime(position['entry_date'])).days,
-                            'strategy': strategy_name
-                        })
-                        
-                        # Remove the position
-                        del portfolio['positions'][symbol]
-                
-                # Update current prices and values for all positions
-                for symbol, position in list(portfolio['positions'].items()):
-                    if symbol in historical_data:
-                        current_price = historical_data[symbol]['close'].iloc[-1]
-                        position['current_price'] = current_price
-                        position['current_value'] = current_price * position['quantity']
-                    else:
-                        # If we don't have data for this symbol, assume price unchanged
-                        pass
-                
-                # Calculate total portfolio value
-                portfolio_value = portfolio['cash']
-                for symbol, position in portfolio['positions'].items():
-                    portfolio_value += position['current_value']
-                
-                # Store the portfolio state for this day
-                strategy_results['portfolio_value'].append(portfolio_value)
-                strategy_results['cash'].append(portfolio['cash'])
-                strategy_results['positions'].append(portfolio['positions'].copy())
-                strategy_results['equity_curve'].append(portfolio_value)
-            
-            # Record all trades
-            strategy_results['trades'] = portfolio['trades']
-            
-            # Calculate performance metrics
-            if len(strategy_results['equity_curve']) > 1:
-                initial_value = strategy_results['equity_curve'][0]
-                final_value = strategy_results['equity_curve'][-1]
-                
-                # Total return
-                total_return = (final_value - initial_value) / initial_value * 100
-                
-                # Annualized return (assuming 252 trading days in a year)
-                days_held = len(strategy_results['equity_curve']) - 1
-                annual_return = ((final_value / initial_value) ** (252 / days_held) - 1) * 100 if days_held > 0 else 0
-                
-                # Convert equity curve to pandas series for calculations
-                equity_series = pd.Series(strategy_results['equity_curve'])
-                
-                # Calculate daily returns
-                daily_returns = equity_series.pct_change().dropna()
-                
-                # Volatility (annualized)
-                volatility = daily_returns.std() * np.sqrt(252) * 100
-                
-                # Sharpe ratio (assuming risk-free rate of 0% for simplicity)
-                sharpe = (daily_returns.mean() * 252) / (daily_returns.std() * np.sqrt(252)) if daily_returns.std() > 0 else 0
-                
-                # Maximum drawdown
-                rolling_max = equity_series.cummax()
-                drawdown = ((equity_series - rolling_max) / rolling_max) * 100
-                max_drawdown = drawdown.min()
-                
-                # Win rate
-                trades = strategy_results['trades']
-                winning_trades = [t for t in trades if t.get('profit', 0) > 0]
-                win_rate = len(winning_trades) / len(trades) * 100 if trades else 0
-                
-                # Average profit per trade
-                if trades:
-                    total_profit = sum(t.get('profit', 0) for t in trades)
-                    avg_profit = total_profit / len(trades)
-                    avg_win = sum(t.get('profit', 0) for t in winning_trades) / len(winning_trades) if winning_trades else 0
-                    losing_trades = [t for t in trades if t.get('profit', 0) <= 0]
-                    avg_loss = sum(t.get('profit', 0) for t in losing_trades) / len(losing_trades) if losing_trades else 0
-                    profit_factor = abs(sum(t.get('profit', 0) for t in winning_trades) / 
-                                      sum(t.get('profit', 0) for t in losing_trades)) if losing_trades and sum(t.get('profit', 0) for t in losing_trades) != 0 else float('inf')
-                else:
-                    total_profit = 0
-                    avg_profit = 0
-                    avg_win = 0
-                    avg_loss = 0
-                    profit_factor = 0
-                
-                # Store metrics
-                strategy_results['metrics'] = {
-                    'initial_capital': initial_value,
-                    'final_value': final_value,
-                    'total_return_pct': total_return,
-                    'annual_return_pct': annual_return,
-                    'volatility_pct': volatility,
-                    'sharpe_ratio': sharpe,
-                    'max_drawdown_pct': max_drawdown,
-                    'win_rate_pct': win_rate,
-                    'trade_count': len(trades),
-                    'total_profit': total_profit,
-                    'avg_profit_per_trade': avg_profit,
-                    'avg_win': avg_win,
-                    'avg_loss': avg_loss,
-                    'profit_factor': profit_factor
+        # Strategies are independent, so simulate them in parallel processes.
+        # Workers log through a queue drained into this process's handlers
+        log_queue = multiprocessing.Queue()
+        log_listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers)
+        log_listener.start()
+        
+        # data goes to each worker once as an argument; its provider gets it
+        # there, so the strategy itself is pickled without the price history
+        for strategy in self.strategies.values():
+            strategy.data_provider.full_data = {}
+        
+        workers = max(1, min(len(self.strategies), os.cpu_count() or 1))
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=setup_worker_logging,
+                                     initargs=(log_queue,)) as pool:
+                futures = {
+                    pool.submit(_run_single_strategy, strategy_name, strategy, data,
+                                symbols, common_dates, days, initial_capital): strategy_name
+                    for strategy_name, strategy in self.strategies.items()
                 }
-            
-            # Store results for this strategy
-            results[strategy_name] = strategy_results
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Backtesting strategies"):
+                    results[futures[future]] = future.result()
+        finally:
+            log_listener.stop()
         
-        # Store all results
+        # Keep results in registration order regardless of completion order
+        results = {name: results[name] for name in self.strategies if name in results}
+        
+        # Store all results, ranked once for reporting
         self.results = results
+        self._ranking = sorted(results.items(),
+                               key=lambda kv: kv[1].get('metrics', {}).get('total_return_pct', 0),
+                               reverse=True)
         
         return results
     
@@ -419,23 +655,29 @@ class Backtest:
         if not os.path.exists(plots_folder):
             os.makedirs(plots_folder)
         
+        # Headless runs render straight to files without touching a display
+        if not show_plots:
+            plt.switch_backend('Agg')
+        
         # Equity curves
-        plt.figure(figsize=(12, 8))
+        fig, ax = plt.subplots(figsize=(12, 8))
         for strategy_name, results in self.results.items():
             if 'equity_curve' in results:
-                plt.plot(results['equity_curve'], label=strategy_name)
+                ax.plot(results['equity_curve'], label=strategy_name)
         
-        plt.title('Portfolio Equity Curves')
-        plt.xlabel('Trading Days')
-        plt.ylabel('Portfolio Value ($)')
-        plt.legend()
-        plt.grid(True)
+        ax.set_title('Portfolio Equity Curves')
+        ax.set_xlabel('Trading Days')
+        ax.set_ylabel('Portfolio Value ($)')
+        ax.legend()
+        ax.grid(True)
         
         # Save the plot
-        plt.savefig(os.path.join(plots_folder, 'equity_curves.png'))
+        fig.savefig(os.path.join(plots_folder, 'equity_curves.png'))
         
         if show_plots:
             plt.show()
+        else:
+            plt.close(fig)
         
         # Performance comparison chart
         metrics = ['total_return_pct', 'annual_return_pct', 'sharpe_ratio', 'max_drawdown_pct', 'win_rate_pct']
@@ -448,34 +690,38 @@ class Backtest:
                 strategy_metrics[strategy_name] = [results['metrics'].get(m, 0) for m in metrics]
         
         if strategy_metrics:
-            # Create bar chart for each metric
+            strategies = list(strategy_metrics.keys())
+            
+            # Create bar chart for each metric; saved-only charts share one figure
+            fig = ax = None
             for i, (metric, label) in enumerate(zip(metrics, metric_labels)):
-                plt.figure(figsize=(10, 6))
-                
-                strategies = list(strategy_metrics.keys())
-                values = [results['metrics'].get(metric, 0) for strategy, results in self.results.items() 
-                         if strategy in strategies and 'metrics' in results]
+                if fig is None or show_plots:
+                    fig, ax = plt.subplots(figsize=(10, 6))
+                else:
+                    ax.clear()
                 
-                bars = plt.bar(strategies, values)
+                values = [strategy_metrics[strategy][i] for strategy in strategies]
+                bars = ax.bar(strategies, values)
                 
                 # Add value labels on top of bars
                 for bar in bars:
                     height = bar.get_height()
-                    plt.text(bar.get_x() + bar.get_width()/2., height,
+                    ax.text(bar.get_x() + bar.get_width()/2., height,
                             f'{height:.2f}',
                             ha='center', va='bottom')
                 
-                plt.title(f'Strategy Comparison: {label}')
-                plt.ylabel(label)
-                plt.grid(axis='y', linestyle='--', alpha=0.7)
+                ax.set_title(f'Strategy Comparison: {label}')
+                ax.set_ylabel(label)
+                ax.grid(axis='y', linestyle='--', alpha=0.7)
                 
                 # Save the plot
-                plt.savefig(os.path.join(plots_folder, f'comparison_{metric}.png'))
+                fig.savefig(os.path.join(plots_folder, f'comparison_{metric}.png'))
                 
                 if show_plots:
                     plt.show()
-                else:
-                    plt.close()
+            
+            if not show_plots:
+                plt.close(fig)
     
     def save_results(self):
         """Save backtest results to files."""
@@ -486,48 +732,43 @@ class Backtest:
         # Create a timestamp for the results
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        # Save results to JSON
+        # Bulky per-day and per-trade data goes to columnar files; Parquet needs pyarrow
+        def write_table(df, name):
+            if pyarrow is not None:
+                df.to_parquet(os.path.join(self.output_folder, f'{name}_{timestamp}.parquet'),
+                              compression='zstd', index=False)
+            else:
+                df.to_csv(os.path.join(self.output_folder, f'{name}_{timestamp}.csv'), index=False)
+        
+        write_table(pd.DataFrame({name: pd.Series(results['equity_curve'])
+                                  for name, results in self.results.items()}), 'equity_curves')
+        
+        for strategy_name, results in self.results.items():
+            if results.get('trades'):
+                write_table(pd.DataFrame(results['trades']), f'{strategy_name}_trades')
+            
+            # Holdings stay a dense day x symbol quantity matrix
+            if results.get('positions') is not None:
+                np.save(os.path.join(self.output_folder, f'{strategy_name}_positions_{timestamp}.npy'),
+                        results['positions'])
+        
+        # Save the small scalar results to JSON
         results_file = os.path.join(self.output_folder, f'backtest_results_{timestamp}.json')
         
-        # Prepare results for JSON serialization
         json_results = {}
         for strategy_name, results in self.results.items():
-            # Convert positions to serializable format
-            serializable_results = results.copy()
-            
-            # Handle positions (list of dicts)
-            if 'positions' in serializable_results:
-                serializable_positions = []
-                for day_positions in serializable_results['positions']:
-                    serializable_day = {}
-                    for symbol, pos in day_positions.items():
-                        serializable_day[symbol] = {
-                            'quantity': pos['quantity'],
-                            'entry_price': float(pos['entry_price']),
-                            'current_price': float(pos['current_price']),
-                            'current_value': float(pos['current_value'])
-                        }
-                        if 'entry_date' in pos:
-                            serializable_day[symbol]['entry_date'] = str(pos['entry_date'])
-                    serializable_positions.append(serializable_day)
-                serializable_results['positions'] = serializable_positions
-            
-            # Handle trades (convert dates to strings)
-            if 'trades' in serializable_results:
-                for trade in serializable_results['trades']:
-                    trade['date'] = str(trade['date'])
-                    if 'entry_date' in trade:
-                        trade['entry_date'] = str(trade['entry_date'])
-            
             # Handle metrics (ensure all values are serializable)
-            if 'metrics' in serializable_results:
-                for key, value in serializable_results['metrics'].items():
-                    if isinstance(value, np.float64) or isinstance(value, np.float32):
-                        serializable_results['metrics'][key] = float(value)
-                    elif isinstance(value, np.int64) or isinstance(value, np.int32):
-                        serializable_results['metrics'][key] = int(value)
+            metrics = {}
+            for key, value in results.get('metrics', {}).items():
+                if isinstance(value, (np.floating, np.integer)):
+                    value = value.item()
+                metrics[key] = value
             
-            json_results[strategy_name] = serializable_results
+            json_results[strategy_name] = {
+                'symbols': results['symbols'],
+                'days': results['days'],
+                'metrics': metrics
+            }
         
         # Save to file
         with open(results_file, 'w') as f:
@@ -573,9 +814,7 @@ class Backtest:
         print(f"BACKTEST SUMMARY - {len(self.results)} Strategies")
         print("="*80)
         
-        for strategy_name, results in sorted(self.results.items(), 
-                                           key=lambda x: x[1].get('metrics', {}).get('total_return_pct', 0),
-                                           reverse=True):
+        for strategy_name, results in self._ranking:
             if 'metrics' in results:
                 metrics = results['metrics']
                 print(f"\nStrategy: {strategy_name}")
@@ -612,18 +851,14 @@ class Backtest:
         # Print overall ranking
         print("\nSTRATEGY RANKING BY TOTAL RETURN")
         print("-" * 50)
-        ranking = []
-        for strategy_name, results in self.results.items():
-            if 'metrics' in results:
-                ranking.append((
-                    strategy_name,
+        ranking = [(strategy_name,
                     results['metrics'].get('total_return_pct', 0),
                     results['metrics'].get('sharpe_ratio', 0),
-                    results['metrics'].get('max_drawdown_pct', 0)
-                ))
+                    results['metrics'].get('max_drawdown_pct', 0))
+                   for strategy_name, results in self._ranking if 'metrics' in results]
         
-        # Sort by total return
-        for i, (strategy, ret, sharpe, dd) in enumerate(sorted(ranking, key=lambda x: x[1], reverse=True)):
+        # Already sorted by total return
+        for i, (strategy, ret, sharpe, dd) in enumerate(ranking):
             print(f"{i+1}. {strategy:15} - Return: {ret:7.2f}%, Sharpe: {sharpe:5.2f}, Max DD: {dd:7.2f}%")
         
         print("="*80 + "\n")
@@ -0,0 +1,20 @@
+"""Optional Numba compilation for numeric kernels."""
+try:
+    import numba
+    prange = numba.prange
+except ImportError:
+    numba = None
+    prange = range  # Serial loop for parallel=True kernels without Numba
+
+def jit(func=None, **options):
+    """Compile func in nopython mode when Numba is installed.
+    
+    Use bare as @jit or with numba.njit options as @jit(cache=True).
+    Without Numba the function is returned unchanged, so kernels must also
+    be valid plain Python.
+    """
+    if func is None:
+        return lambda f: jit(f, **options)
+    if numba is None:
+        return func
+    return numba.njit(error_model='numpy', **options)(func)
\ No newline at end of file
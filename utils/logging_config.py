@@ -1,24 +1,112 @@
 """Logging configuration."""
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import time
 from datetime import datetime
 from config.settings import LOG_LEVEL, LOG_FILE
 
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None  # Background thread writing queued records to the real handlers
+
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that writes through a large buffer instead of flushing every record.
+    
+    The buffer is flushed at most once per ``flush_interval`` seconds, and
+    immediately for ERROR and above so failures reach disk before a crash.
+    Records left in the buffer when logging goes quiet are flushed by the
+    IdleFlushQueueListener feeding this handler.
+    """
+    
+    def __init__(self, filename, mode='a', encoding=None, buffer_size=65536, flush_interval=1.0):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        super().__init__(filename, mode, encoding)
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            now = time.monotonic()
+            if record.levelno >= logging.ERROR or now - self._last_flush >= self.flush_interval:
+                self.stream.flush()
+                self._last_flush = now
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+class IdleFlushQueueListener(logging.handlers.QueueListener):
+    """QueueListener that flushes its handlers whenever the queue goes quiet.
+    
+    Buffered handlers only flush while records arrive, so without this the
+    tail of a burst could sit in memory until the next record or exit.
+    """
+    
+    def __init__(self, queue, *handlers, idle_flush=1.0):
+        super().__init__(queue, *handlers)
+        self.idle_flush = idle_flush
+    
+    def dequeue(self, block):
+        if not block:
+            return self.queue.get(block=False)
+        while True:
+            try:
+                return self.queue.get(timeout=self.idle_flush)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
 def setup_logging():
-    """Set up logging configuration."""
+    """Set up logging configuration.
+    
+    Records are only enqueued by the calling thread; a QueueListener does
+    the file and console I/O in the background.
+    """
+    global _listener
+    
     # Create logs directory if it doesn't exist
     os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
     
-    # Set up logging
-    logging.basicConfig(
-        level=getattr(logging, LOG_LEVEL),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(LOG_FILE),
-            logging.StreamHandler()
-        ]
-    )
+    if _listener is None:
+        formatter = logging.Formatter(LOG_FORMAT)
+        file_handler = BufferedFileHandler(LOG_FILE)
+        handlers = [file_handler, logging.StreamHandler()]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        log_queue = queue.SimpleQueue()
+        _listener = IdleFlushQueueListener(log_queue, *handlers)
+        _listener.start()
+        # atexit runs in reverse order: drain the queue first, then flush the buffer
+        atexit.register(file_handler.flush)
+        atexit.register(_listener.stop)
+        
+        # Set up logging
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, LOG_LEVEL))
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
     
     logger = logging.getLogger('EthicalCapitalism')
-    logger.info(f"Logging initialized at {datetime.now().isoformat()}")
-    return logger
\ No newline at end of file
+    logger.info("Logging initialized at %s", datetime.now().isoformat())
+    return logger
+
+def setup_worker_logging(log_queue):
+    """Send a worker process's log records to its parent through log_queue.
+    
+    Forked workers inherit the parent's QueueHandler but not the listener
+    thread draining it, so their records would otherwise be lost. The parent
+    drains log_queue into its own handlers.
+    """
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(getattr(logging, LOG_LEVEL))
@@ -1,8 +1,8 @@
 """Market hours checking functionality."""
 import logging
+import time as _time
 from datetime import datetime, time
-import pytz
-from config.symbols import EXCHANGE_TIMEZONES
+from config.symbols import EXCHANGE_TZ
 
 logger = logging.getLogger('utils.market_hours')
 
@@ -12,14 +12,89 @@ class MarketHoursChecker:
     def __init__(self, ib_connection):
         """Initialize with an IB connection."""
         self.ib_connection = ib_connection
+        self._has_details = set()  # (conId, symbol, exchange) of contracts IB returned details for
+        self._open_minute = None  # Minute bucket the cached statuses belong to
+        self._open_status = {}    # Exchange -> open status during that minute
+        self._offset_day = None   # UTC day the cached offsets belong to
+        self._utc_offsets = {}    # Exchange -> seconds to add to UTC for local time
         
         # Standard market hours by exchange (simplified)
         self.market_hours = {
-            'LSE': {'open': time(8, 0), 'close': time(16, 30), 'timezone': 'Europe/London'},
-            'XETRA': {'open': time(9, 0), 'close': time(17, 30), 'timezone': 'Europe/Berlin'},
-            'TSX': {'open': time(9, 30), 'close': time(16, 0), 'timezone': 'America/Toronto'},
-            'NASDAQ': {'open': time(9, 30), 'close': time(16, 0), 'timezone': 'America/New_York'}
+            'LSE': {'open': time(8, 0), 'close': time(16, 30), 'timezone': EXCHANGE_TZ['LSE']},
+            'XETRA': {'open': time(9, 0), 'close': time(17, 30), 'timezone': EXCHANGE_TZ['XETRA']},
+            'TSX': {'open': time(9, 30), 'close': time(16, 0), 'timezone': EXCHANGE_TZ['TSX']},
+            'NASDAQ': {'open': time(9, 30), 'close': time(16, 0), 'timezone': EXCHANGE_TZ['NASDAQ']}
         }
+        
+        # Minute-of-day bounds so the open check is a plain integer compare
+        for hours in self.market_hours.values():
+            hours['open_min'] = hours['open'].hour * 60 + hours['open'].minute
+            hours['close_min'] = hours['close'].hour * 60 + hours['close'].minute
+    
+    def _contract_known(self, contract):
+        """Check whether IB returns contract details.
+        
+        Only successful lookups are remembered, so a contract is requested
+        once when IB knows it and retried on later checks after a failure.
+        """
+        key = (contract.conId, contract.symbol, contract.exchange)
+        if key in self._has_details:
+            return True
+        ib = self.ib_connection.ensure_connection()
+        if not ib.reqContractDetails(contract):
+            return False
+        self._has_details.add(key)
+        return True
+    
+    def _utc_offset(self, exchange, now):
+        """Return an exchange's UTC offset in seconds, refreshed once per UTC day.
+        
+        DST changes happen overnight at weekends, when every supported
+        exchange is closed, so a daily refresh never misreads trading hours.
+        """
+        day = int(now // 86400)
+        if day != self._offset_day:
+            self._offset_day = day
+            self._utc_offsets = {}
+        
+        offset = self._utc_offsets.get(exchange)
+        if offset is None:
+            timezone = self.market_hours[exchange]['timezone']
+            offset = int(datetime.now(timezone).utcoffset().total_seconds())
+            self._utc_offsets[exchange] = offset
+        return offset
+    
+    def _is_exchange_open(self, exchange, now):
+        """Check an exchange's hours, reusing the result within the same minute.
+        
+        Symbols sharing an exchange get the same answer, so only the first
+        check per exchange per minute converts the clock. The cache is reset
+        when the minute changes, which keeps it to at most one entry per exchange.
+        
+        Args:
+            exchange: Exchange code present in market_hours
+            now: Current UNIX time in seconds
+        """
+        minute_bucket = int(now // 60)
+        if minute_bucket != self._open_minute:
+            self._open_minute = minute_bucket
+            self._open_status = {}
+        
+        is_open = self._open_status.get(exchange)
+        if is_open is None:
+            hours = self.market_hours[exchange]
+            
+            # Get current minute of the day in market local time
+            now_min = int((now + self._utc_offset(exchange, now)) % 86400 // 60)
+            
+            # Check if current time is within market hours; the close minute
+            # itself counts as closed so no order goes out after the close
+            is_open = hours['open_min'] <= now_min < hours['close_min']
+            
+            # In a real implementation, you'd also check for holidays here
+            
+            self._open_status[exchange] = is_open
+        return is_open
     
     def is_market_open(self, contract):
         """Check if the market for this contract is open.
@@ -30,36 +105,20 @@ class MarketHoursChecker:
         Returns:
             bool: True if market is open, False otherwise
         """
-        ib = self.ib_connection.ensure_connection()
+        # Unknown exchanges need neither the RPC nor the clock
+        exchange = contract.exchange
+        if exchange not in self.market_hours:
+            logger.warning("Unknown exchange %s for %s", exchange, contract.symbol)
+            return False
         
         try:
-            # Get contract details for exchange info
-            details = ib.reqContractDetails(contract)
-            if not details:
-                logger.warning(f"Could not get contract details for {contract.symbol}")
+            # Validate the contract with IB once; the hours only need contract.exchange
+            if not self._contract_known(contract):
+                logger.warning("Could not get contract details for %s", contract.symbol)
                 return False
             
-            exchange = contract.exchange
-            
-            # Get timezone for the exchange
-            if exchange in self.market_hours:
-                market_timezone = pytz.timezone(self.market_hours[exchange]['timezone'])
-                market_open = self.market_hours[exchange]['open']
-                market_close = self.market_hours[exchange]['close']
-                
-                # Get current time in market timezone
-                now = datetime.now(market_timezone).time()
-                
-                # Check if current time is within market hours
-                is_open = market_open <= now <= market_close
-                
-                # In a real implementation, you'd also check for holidays here
-                
-                return is_open
-            else:
-                logger.warning(f"Unknown exchange {exchange} for {contract.symbol}")
-                return False
+            return self._is_exchange_open(exchange, _time.time())
             
         except Exception as e:
-            logger.error(f"Error checking market hours for {contract.symbol}: {e}")
+            logger.error("Error checking market hours for %s: %s", contract.symbol, e)
             return False
\ No newline at end of file
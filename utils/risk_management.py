@@ -1,11 +1,86 @@
 """Enhanced risk management functionality."""
 import logging
+import math
+import time
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from utils.jit import jit, numba, prange
+from config.settings import HISTORY_FETCH_WORKERS, CORRELATION_CACHE_TTL
 
 logger = logging.getLogger('utils.advanced_risk_management')
 
+_INV_SQRT_252 = 1.0 / math.sqrt(252.0)  # Annualized -> daily volatility
+
+@jit(parallel=True, cache=True)
+def _correlation_kernel(returns):
+    """Correlate the columns of a return array with compiled loops.
+    
+    Columns are standardized once, then each pair's correlation is the
+    scaled dot product of two columns, with rows of the result computed in
+    parallel. Sums are accumulated in float64 whatever the input dtype.
+    """
+    n, m = returns.shape
+    z = np.empty((n, m), dtype=returns.dtype)
+    for j in range(m):
+        mean = 0.0
+        for k in range(n):
+            mean += returns[k, j]
+        mean /= n
+        ss = 0.0
+        for k in range(n):
+            d = returns[k, j] - mean
+            z[k, j] = d
+            ss += d * d
+        scale = np.sqrt(ss)
+        for k in range(n):
+            z[k, j] /= scale
+    
+    corr = np.empty((m, m), dtype=returns.dtype)
+    for i in prange(m):
+        for j in range(i, m):
+            total = 0.0
+            for k in range(n):
+                total += z[k, i] * z[k, j]
+            corr[i, j] = total
+            corr[j, i] = total
+    return corr
+
+def correlation_from_returns(returns):
+    """Calculate the correlation matrix of the columns of a return array.
+    
+    Uses the parallel compiled kernel when Numba is installed; the plain
+    Python loops would be far slower than np.corrcoef, so that is used otherwise.
+    
+    Args:
+        returns: 2-D float32 or float64 array, one column of returns per symbol
+        
+    Returns:
+        np.ndarray: Symmetric correlation matrix in the dtype of ``returns``
+    """
+    if numba is None:
+        return np.corrcoef(returns, rowvar=False).astype(returns.dtype, copy=False)
+    return _correlation_kernel(returns)
+
+class CorrelationMatrix:
+    """Symmetric correlation matrix with a symbol -> row/column index."""
+    
+    def __init__(self, symbols, matrix):
+        """Initialize from symbols and the matrix whose rows and columns follow them."""
+        self.symbols = list(symbols)
+        self.matrix = matrix
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+    
+    def __contains__(self, symbol):
+        return symbol in self.index
+    
+    def get(self, symbol, other):
+        """Return the correlation between two symbols, or None if either is missing."""
+        i = self.index.get(symbol)
+        j = self.index.get(other)
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
+
 class AdvancedRiskManager:
     """Advanced risk management with portfolio-level controls."""
     
@@ -27,56 +102,106 @@ class AdvancedRiskManager:
         self.max_correlation = max_correlation
         self.position_sizing_method = position_sizing_method
         self.correlation_matrix = None
+        self._corr_cache_ts = 0.0
+        self._corr_cache_key = None
         self.current_drawdown = 0
         self.peak_value = 0
-        self.trailing_stops = {}  # Symbol -> trailing stop price
+        self._metrics = None  # Last update_portfolio_metrics() result
+        self._metrics_version = None  # Portfolio version those metrics were computed at
+        self._limits_ok = True  # Last drawdown/position-count verdict
+        self._limits_version = None  # Portfolio version that verdict belongs to
+        self._win_counts = {}  # Symbol -> closed trades that made money
+        self._trade_counts = {}  # Symbol -> closed trades
+        self._stop_idx = {}  # Symbol -> slot in _stops
+        self._stop_symbols = []  # Symbol in each live slot of _stops
+        self._stops = np.full(8, np.nan)  # Trailing stop prices; only the first len(_stop_idx) slots are live
     
     def update_portfolio_metrics(self, portfolio):
-        """Update portfolio metrics like drawdown and peak value."""
-        current_value = portfolio.get_total_value()
+        """Update portfolio metrics like drawdown and peak value.
         
-        # Update peak value
-        if current_value > self.peak_value:
-            self.peak_value = current_value
+        Portfolios exposing a ``version`` counter get the previous metrics back
+        until the counter moves, skipping the total value recomputation.
+        """
+        version = getattr(portfolio, 'version', None)
+        if version is not None and version == self._metrics_version and self._metrics is not None:
+            return self._metrics
+        
+        current_value = portfolio.get_total_value()
         
-        # Calculate current drawdown
+        # Update peak value and current drawdown
+        self.peak_value = max(self.peak_value, current_value)
         if self.peak_value > 0:
-            self.current_drawdown = (self.peak_value - current_value) / self.peak_value
+            self.current_drawdown = 1.0 - current_value / self.peak_value
         
-        return {
+        self._metrics_version = version
+        self._metrics = {
             'current_value': current_value,
             'peak_value': self.peak_value,
             'current_drawdown': self.current_drawdown
         }
+        return self._metrics
     
-    def update_correlation_matrix(self, symbols, lookback_days=60):
-        """Update correlation matrix for the given symbols."""
-        if not symbols:
+    def update_correlation_matrix(self, contracts, lookback_days=60, force=False):
+        """Update correlation matrix for the given contracts.
+        
+        Daily correlations move slowly, so a matrix built for the same symbols
+        and lookback is reused for CORRELATION_CACHE_TTL seconds.
+        
+        Args:
+            contracts: IB contract objects, as a list or a dict keyed by symbol
+            lookback_days: Days of history to correlate over
+            force: Rebuild the matrix even if the cached one is still fresh
+            
+        Returns:
+            CorrelationMatrix: Correlation matrix by symbol, or None with fewer than two series
+        """
+        if isinstance(contracts, dict):
+            contracts = list(contracts.values())
+        
+        key = (tuple(sorted(contract.symbol for contract in contracts)), lookback_days)
+        if (not force and key == self._corr_cache_key
+                and time.monotonic() - self._corr_cache_ts < CORRELATION_CACHE_TTL):
+            return self.correlation_matrix
+        self._corr_cache_key = key
+        self._corr_cache_ts = time.monotonic()
+        
+        if not contracts:
             self.correlation_matrix = None
             return None
         
-        # Get historical data for all symbols
+        # Get historical data for all symbols concurrently
+        duration = f'{lookback_days} D'
+        if hasattr(self.data_provider, 'get_batch'):
+            frames = self.data_provider.get_batch(contracts, duration=duration)
+        else:
+            workers = max(1, min(HISTORY_FETCH_WORKERS, len(contracts)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                frames = list(pool.map(
+                    lambda contract: self.data_provider.get_historical_data(contract, duration=duration),
+                    contracts
+                ))
+        
         price_data = {}
-        for symbol in symbols:
-            contract = next((c for c in symbols if c.symbol == symbol), None)
-            if contract:
-                df = self.data_provider.get_historical_data(
-                    contract, duration=f'{lookback_days} D')
-                if df is not None and len(df) > 10:
-                    price_data[symbol] = df['close']
+        for contract, df in zip(contracts, frames):
+            if df is not None and len(df) > 10:
+                price_data[contract.symbol] = df['close'].to_numpy(dtype=np.float32)
         
         if len(price_data) < 2:
             self.correlation_matrix = None
             return None
         
-        # Create a DataFrame with all price series
-        df = pd.DataFrame(price_data)
+        # Stack the most recent closes shared by every symbol into one float32 array;
+        # two-decimal correlations don't need float64 inputs
+        order = list(price_data)
+        n = min(len(closes) for closes in price_data.values())
+        prices = np.column_stack([price_data[symbol][-n:] for symbol in order])
         
-        # Calculate returns
-        returns = df.pct_change().dropna()
+        # Calculate returns, dropping days where any symbol has a gap
+        returns = np.diff(prices, axis=0) / prices[:-1]
+        returns = returns[~np.isnan(returns).any(axis=1)]
         
-        # Calculate correlation matrix
-        self.correlation_matrix = returns.corr()
+        # Calculate correlation matrix with the compiled kernel
+        self.correlation_matrix = CorrelationMatrix(order, correlation_from_returns(np.ascontiguousarray(returns)))
         
         return self.correlation_matrix
     
@@ -84,21 +209,32 @@ class AdvancedRiskManager:
         """Check if adding a new position would exceed correlation limits."""
         if self.correlation_matrix is None or symbol not in self.correlation_matrix:
             return True
+        index = self.correlation_matrix.index
         
-        # Get current positions
-        current_symbols = list(portfolio.positions.keys())
-        
-        # Check correlation with existing positions
-        for existing_symbol in current_symbols:
-            if existing_symbol in self.correlation_matrix and symbol in self.correlation_matrix:
-                correlation = self.correlation_matrix.loc[symbol, existing_symbol]
-                if abs(correlation) > self.max_correlation:
-                    logger.warning(f"Correlation between {symbol} and {existing_symbol} " 
-                                  f"is too high: {correlation:.2f}")
-                    return False
+        # Check correlation with existing positions in one vectorized test
+        held = [s for s in portfolio.positions if s in index]
+        existing_idx = np.fromiter((index[s] for s in held), dtype=np.intp, count=len(held))
+        correlations = self.correlation_matrix.matrix[index[symbol], existing_idx]
+        too_high = np.flatnonzero(np.abs(correlations) > self.max_correlation)
+        if too_high.size:
+            k = too_high[0]
+            logger.warning("Correlation between %s and %s is too high: %.2f",
+                           symbol, held[k], correlations[k])
+            return False
         
         return True
     
+    def record_trade(self, symbol, won):
+        """Count a closed trade towards the symbol's Kelly win rate.
+        
+        Args:
+            symbol: Symbol of the closed position
+            won: True if the trade closed at a profit
+        """
+        self._trade_counts[symbol] = self._trade_counts.get(symbol, 0) + 1
+        if won:
+            self._win_counts[symbol] = self._win_counts.get(symbol, 0) + 1
+    
     def calculate_optimal_position_size(self, price, volatility, portfolio_value, symbol, portfolio, 
                                        max_positions=3):
         """Calculate position size using the selected method."""
@@ -125,15 +261,10 @@ class AdvancedRiskManager:
             # Assuming win rate of 50% and reward:risk ratio based on historical data
             win_rate = 0.5  # Default
             
-            # Try to get better estimates if we have historical data
-            if hasattr(portfolio, 'transactions') and portfolio.transactions:
-                trades = [t for t in portfolio.transactions if t['symbol'] == symbol]
-                if trades:
-                    wins = sum(1 for t in trades if (
-                        (t['action'] == 'SELL' and t['price'] > t['entry_price']) or
-                        (t['action'] == 'BUY' and t['price'] < t['entry_price'])
-                    ))
-                    win_rate = wins / len(trades) if len(trades) > 0 else 0.5
+            # Use this symbol's closed-trade record once we have one
+            trades = self._trade_counts.get(symbol, 0)
+            if trades:
+                win_rate = self._win_counts.get(symbol, 0) / trades
             
             # Calculate reward:risk ratio (simplified)
             reward_risk_ratio = 2.0  # Default assumption
@@ -149,7 +280,7 @@ class AdvancedRiskManager:
             
         else:  # Default to volatility-based sizing
             # Convert annualized volatility to daily
-            daily_volatility = volatility / np.sqrt(252)
+            daily_volatility = volatility * _INV_SQRT_252
             
             # Calculate stop loss amount
             # Either use fixed percentage or volatility-based
@@ -163,19 +294,20 @@ class AdvancedRiskManager:
                 # Risk-based position sizing
                 position_size = int(risk_per_trade / stop_loss_amount)
         
-        # Ensure minimum and maximum position sizes
-        position_size = max(1, min(position_size, int(portfolio_value * 0.2 / price)))
+        # Ensure minimum and maximum (20% of portfolio) position sizes
+        upper = portfolio_value * 0.2 / price
+        position_size = int(min(max(1, position_size), upper)) if upper >= 1.0 else 1
         
         return position_size
     
-    def check_portfolio_risk(self, portfolio, new_position_details=None):
-        """Check if adding a new position would exceed risk limits."""
+    def _check_portfolio_limits(self, portfolio):
+        """Check the drawdown and position-count limits for the portfolio as it stands."""
         # Update portfolio metrics
         metrics = self.update_portfolio_metrics(portfolio)
         
         # Check drawdown limit
         if metrics['current_drawdown'] >= self.max_drawdown:
-            logger.warning(f"Maximum drawdown reached: {metrics['current_drawdown']:.2%}")
+            logger.warning("Maximum drawdown reached: %.2f%%", metrics['current_drawdown'] * 100)
             return False
         
         # Check maximum positions
@@ -183,6 +315,19 @@ class AdvancedRiskManager:
         if current_positions >= 3:  # Max positions hardcoded here
             return False
         
+        return True
+    
+    def check_portfolio_risk(self, portfolio, new_position_details=None):
+        """Check if adding a new position would exceed risk limits."""
+        # The drawdown and position-count checks only change with the portfolio,
+        # so screening many candidates against the same version reuses them
+        version = getattr(portfolio, 'version', None)
+        if version is None or version != self._limits_version:
+            self._limits_ok = self._check_portfolio_limits(portfolio)
+            self._limits_version = version
+        if not self._limits_ok:
+            return False
+        
         # Check correlation if we have position details
         if new_position_details and 'symbol' in new_position_details:
             if not self.check_correlation(new_position_details['symbol'], portfolio):
@@ -190,20 +335,79 @@ class AdvancedRiskManager:
         
         return True
     
+    @property
+    def trailing_stops(self):
+        """dict: Symbol -> current trailing stop price."""
+        return dict(zip(self._stop_symbols, self._stops[:len(self._stop_symbols)].tolist()))
+    
+    def stop_symbols(self):
+        """Symbols in the order bulk_should_exit() expects their prices."""
+        return list(self._stop_symbols)
+    
+    def has_trailing_stop(self, symbol):
+        """Check whether a trailing stop is tracked for symbol."""
+        return symbol in self._stop_idx
+    
+    def drop_trailing_stop(self, symbol):
+        """Stop tracking a symbol's trailing stop, e.g. once its position is closed.
+        
+        The last slot moves into the freed one, so stop_symbols() order changes.
+        """
+        i = self._stop_idx.pop(symbol, None)
+        if i is None:
+            return
+        last = len(self._stop_symbols) - 1
+        moved = self._stop_symbols.pop()
+        if i != last:
+            self._stops[i] = self._stops[last]
+            self._stop_symbols[i] = moved
+            self._stop_idx[moved] = i
+        self._stops[last] = np.nan
+    
+    def _add_stop(self, symbol, stop):
+        """Give a symbol the next trailing stop slot, growing the array as needed."""
+        i = len(self._stop_idx)
+        if i == len(self._stops):
+            grown = np.full(2 * i, np.nan)
+            grown[:i] = self._stops
+            self._stops = grown
+        self._stops[i] = stop
+        self._stop_idx[symbol] = i
+        self._stop_symbols.append(symbol)
+        return i
+    
     def calculate_trailing_stop(self, symbol, current_price, position):
         """Calculate and update trailing stop price."""
-        if symbol not in self.trailing_stops:
+        i = self._stop_idx.get(symbol)
+        if i is None:
             # Initialize trailing stop at fixed percentage below entry
             entry_price = position.get('avg_cost', current_price)
-            initial_stop = entry_price * 0.95  # 5% initial stop
-            self.trailing_stops[symbol] = initial_stop
+            i = self._add_stop(symbol, entry_price * 0.95)  # 5% initial stop
         else:
             # Update trailing stop if price has moved in our favor
             new_stop = current_price * 0.95  # 5% below current price
-            if new_stop > self.trailing_stops[symbol]:
-                self.trailing_stops[symbol] = new_stop
+            if new_stop > self._stops[i]:
+                self._stops[i] = new_stop
+        
+        return float(self._stops[i])
+    
+    def bulk_should_exit(self, prices):
+        """Check every tracked trailing stop against current prices at once.
+        
+        Args:
+            prices: Current prices ordered like stop_symbols()
+            
+        Returns:
+            np.ndarray: Boolean mask, True where the price is below its trailing stop
+        """
+        stops = self._stops[:len(self._stop_symbols)]
+        prices = np.asarray(prices, dtype=np.float64)
+        stopped = prices < stops
         
-        return self.trailing_stops[symbol]
+        # Ratchet the stops up exactly as calculate_trailing_stop does; fmax
+        # keeps the old stop where a price is missing (NaN)
+        np.fmax(stops, prices * 0.95, out=stops)
+        return stopped
     
     def should_exit_position(self, symbol, current_price, position, days_held):
         """Determine if a position should be exited based on multiple criteria."""